@@ -0,0 +1,119 @@
+"""
+冷啟動時間基準
+
+每一輪啟動一個全新的 Python 子程序，量測：
+  - import_ms：匯入 src.app（含所有模組）所需時間
+  - create_app_ms：呼叫 create_app() 所需時間
+  - first_request_ms：第一個簽章 webhook 請求的延遲（含延遲初始化：建表、索引、背景工作）
+  - second_request_ms：第二個請求的延遲（已初始化完成的穩定狀態）
+LineBotApi 以替身取代，不發出網路請求；每輪使用新的 SQLite 檔案。
+
+使用方式：
+    python benchmarks/startup_bench.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+
+def child():
+    """在子程序中量測一次冷啟動，結果以 JSON 輸出到 stdout"""
+    import webhook_bench
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    os.environ['LINE_CHANNEL_SECRET'] = webhook_bench.BENCH_CHANNEL_SECRET
+    os.environ['LINE_CHANNEL_ACCESS_TOKEN'] = webhook_bench.BENCH_ACCESS_TOKEN
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+    os.environ.setdefault('AUDIT_RETENTION_INTERVAL', '0')
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+
+    import linebot
+    linebot.LineBotApi = webhook_bench.StubLineBotApi
+
+    started = time.perf_counter()
+    from src.app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+
+    client = app.test_client()
+    timings = []
+    for _ in range(2):
+        body = webhook_bench.webhook_body([
+            webhook_bench.message_event(webhook_bench._group_id(0), 'U' + '0' * 32, '早安')
+        ])
+        request_started = time.perf_counter()
+        response = client.post(
+            '/callback/',
+            data=body,
+            headers={'Content-Type': 'application/json', 'X-Line-Signature': webhook_bench.sign_body(body)}
+        )
+        timings.append((time.perf_counter() - request_started) * 1000.0)
+        if response.status_code != 200:
+            raise SystemExit(f"webhook returned {response.status_code}")
+
+    print(json.dumps({
+        'import_ms': round((imported - started) * 1000.0, 3),
+        'create_app_ms': round((created - imported) * 1000.0, 3),
+        'first_request_ms': round(timings[0], 3),
+        'second_request_ms': round(timings[1], 3),
+    }))
+
+
+def run_once():
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        capture_output=True, text=True, check=True, cwd=REPO_ROOT
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_ms'] = round((time.perf_counter() - started) * 1000.0, 3)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='冷啟動時間基準')
+    parser.add_argument('--runs', type=int, default=5, help='冷啟動次數')
+    parser.add_argument('--output', default=None, help='JSON 結果輸出路徑')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return None
+
+    runs = [run_once() for _ in range(args.runs)]
+    keys = ['import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms', 'process_ms']
+    summary = {}
+    for key in keys:
+        values = sorted(run[key] for run in runs)
+        summary[key] = {'min': values[0], 'median': values[len(values) // 2], 'max': values[-1]}
+        print(f"{key:<18} min {values[0]:>9} ms  median {values[len(values) // 2]:>9} ms  max {values[-1]:>9} ms")
+
+    report = {
+        'benchmark': 'startup',
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'parameters': {'runs': args.runs},
+        'summary': summary,
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
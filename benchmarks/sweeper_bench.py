@@ -0,0 +1,180 @@
+"""
+背景巡檢基準
+
+建立大量群組與歷史操作日誌後，每一輪只在少數群組新增事件（部分為可疑事件），
+比較兩種巡檢方式的耗時與資料庫語句數：
+  - full：對每個群組呼叫 analyze_suspicious_activity（以時間窗口查詢）
+  - incremental：ActivitySweeper.sweep()（只讀取高水位之後的新事件）
+LineBotApi 以替身取代，不發出網路請求。
+
+使用方式：
+    python benchmarks/sweeper_bench.py --groups 2000 --history 20 --rounds 5 --output sweep.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import linebot  # noqa: E402
+from webhook_bench import StubLineBotApi, BENCH_ACCESS_TOKEN  # noqa: E402
+
+linebot.LineBotApi = StubLineBotApi
+os.environ.setdefault('LINE_CHANNEL_ACCESS_TOKEN', BENCH_ACCESS_TOKEN)
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from src.models.group import db, Group, AuditLog  # noqa: E402
+from src.services.activity_sweeper import ActivitySweeper  # noqa: E402
+from src.services.anti_takeover import AntiTakeoverService  # noqa: E402
+from src.utils.database import configure_database  # noqa: E402
+
+
+def build_app(database_url, groups, history):
+    app = Flask('sweeper-bench')
+    configure_database(app, database_url)
+    with app.app_context():
+        db.session.add_all(
+            Group(group_id=f"G{index:06d}", admin_ids=['Ubench'] if index % 10 == 0 else None)
+            for index in range(groups)
+        )
+        db.session.commit()
+        past = datetime.utcnow() - timedelta(hours=1)
+        rows = [
+            {'group_id': f"G{index:06d}", 'action': 'message', 'timestamp': past, 'is_suspicious': False}
+            for index in range(groups) for _ in range(history)
+        ]
+        db.session.connection().execute(AuditLog.__table__.insert(), rows)
+        db.session.commit()
+    return app
+
+
+def append_events(rng, groups, active_groups, events_per_group, suspicious_ratio):
+    rows = []
+    for group_index in rng.sample(range(groups), active_groups):
+        for _ in range(events_per_group):
+            suspicious = rng.random() < suspicious_ratio
+            rows.append({
+                'group_id': f"G{group_index:06d}",
+                'action': 'message_flood' if suspicious else 'message',
+                'timestamp': datetime.utcnow(),
+                'is_suspicious': suspicious
+            })
+    db.session.connection().execute(AuditLog.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def measure(operation):
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    started = time.perf_counter()
+    try:
+        result = operation()
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000.0
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, round(elapsed, 3), statements[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='背景巡檢基準')
+    parser.add_argument('--groups', type=int, default=2000, help='群組數量')
+    parser.add_argument('--history', type=int, default=20, help='每個群組的歷史事件數')
+    parser.add_argument('--rounds', type=int, default=5, help='巡檢輪數')
+    parser.add_argument('--active', type=int, default=20, help='每輪有新事件的群組數')
+    parser.add_argument('--events', type=int, default=10, help='每個活躍群組每輪的新事件數')
+    parser.add_argument('--suspicious-ratio', type=float, default=0.3, help='新事件中可疑事件的比例')
+    parser.add_argument('--workers', type=int, default=4, help='巡檢執行緒數量')
+    parser.add_argument('--skip-full', action='store_true', help='不執行逐群組完整分析')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default=None, help='JSON 結果輸出路徑')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='sweeper-bench-')
+    app = build_app(f"sqlite:///{os.path.join(workdir, 'sweep.db')}", args.groups, args.history)
+    rng = random.Random(args.seed)
+    sweeper = ActivitySweeper(app, max_workers=args.workers, lookback_seconds=0, commit_lag_seconds=0)
+
+    rounds = []
+    with app.app_context():
+        # 第一輪建立游標
+        sweeper.sweep()
+        group_ids = [row.group_id for row in db.session.query(Group.group_id)]
+
+        for round_index in range(args.rounds):
+            new_events = append_events(rng, args.groups, args.active, args.events, args.suspicious_ratio)
+            StubLineBotApi.reset()
+            sweep_result, sweep_ms, sweep_statements = measure(sweeper.sweep)
+            item = {
+                'round': round_index,
+                'new_events': new_events,
+                'incremental': {
+                    'ms': sweep_ms,
+                    'statements': sweep_statements,
+                    'active_groups': sweep_result['active_groups'],
+                    'analyzed_groups': sweep_result['analyzed_groups'],
+                    'findings': len(sweep_result['findings']),
+                    'line_api_calls': dict(StubLineBotApi.calls)
+                }
+            }
+
+            if not args.skip_full:
+                service = AntiTakeoverService(None)
+                analyses, full_ms, full_statements = measure(
+                    lambda: [service.analyze_suspicious_activity(group_id) for group_id in group_ids]
+                )
+                item['full'] = {
+                    'ms': full_ms,
+                    'statements': full_statements,
+                    'suspicious_groups': sum(1 for analysis in analyses if analysis['is_suspicious'])
+                }
+
+            rounds.append(item)
+            line = (
+                f"round {round_index}: {new_events} new events  incremental {sweep_ms:>9} ms "
+                f"({sweep_statements} statements, {sweep_result['analyzed_groups']} analyzed, "
+                f"{len(sweep_result['findings'])} findings)"
+            )
+            if 'full' in item:
+                line += f"  full {item['full']['ms']:>9} ms ({item['full']['statements']} statements)"
+            print(line)
+
+    sweeper.shutdown()
+
+    report = {
+        'benchmark': 'activity_sweeper',
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'parameters': {
+            'groups': args.groups,
+            'history': args.history,
+            'active': args.active,
+            'events': args.events,
+            'suspicious_ratio': args.suspicious_ratio,
+            'workers': args.workers
+        },
+        'rounds': rounds,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
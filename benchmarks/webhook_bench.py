@@ -0,0 +1,412 @@
+"""
+Webhook 壓力測試與重播基準
+
+產生帶有正確簽章的 LINE webhook 請求（一般訊息、成員加入、成員離開、翻群突襲），
+以 main.py 的 Flask app 處理，並以替身取代 LineBotApi，統計吞吐量、
+p50/p95/p99 延遲與資料庫 / 檔案 I/O 次數，結果輸出為 JSON 以便比較版本間的差異。
+
+使用方式：
+    python benchmarks/webhook_bench.py --requests 500 --output bench.json
+    python benchmarks/webhook_bench.py --baseline bench.json
+"""
+import argparse
+import base64
+import builtins
+import hashlib
+import hmac
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_CHANNEL_SECRET = "bench-channel-secret"
+BENCH_ACCESS_TOKEN = "bench-access-token"
+
+
+class StubLineBotApi:
+    """LineBotApi 替身：不發出任何網路請求，只記錄呼叫次數"""
+
+    calls = {}
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @classmethod
+    def reset(cls):
+        cls.calls = {}
+
+    def _record(self, name):
+        StubLineBotApi.calls[name] = StubLineBotApi.calls.get(name, 0) + 1
+
+    def reply_message(self, reply_token, messages, *args, **kwargs):
+        self._record('reply_message')
+
+    def push_message(self, to, messages, *args, **kwargs):
+        self._record('push_message')
+
+    def kickout(self, group_id, user_id, *args, **kwargs):
+        self._record('kickout')
+
+    def __getattr__(self, name):
+        # 其他 API（如取得成員資料）一律記錄後回傳 None
+        def _call(*args, **kwargs):
+            self._record(name)
+            return None
+        return _call
+
+
+class IOCounter:
+    """統計資料庫語句與檔案開啟次數"""
+
+    def __init__(self):
+        self.db_statements = 0
+        self.file_opens = 0
+        self.file_writes = 0
+        self._original_open = builtins.open
+
+    def install(self):
+        counter = self
+        original_open = self._original_open
+
+        def counting_open(file, mode='r', *args, **kwargs):
+            counter.file_opens += 1
+            if any(flag in mode for flag in ('w', 'a', 'x', '+')):
+                counter.file_writes += 1
+            return original_open(file, mode, *args, **kwargs)
+
+        builtins.open = counting_open
+
+        try:
+            from sqlalchemy import event
+            from sqlalchemy.engine import Engine
+
+            @event.listens_for(Engine, 'before_cursor_execute')
+            def _count_statement(conn, cursor, statement, parameters, context, executemany):
+                counter.db_statements += 1
+        except ImportError:
+            pass
+
+    def uninstall(self):
+        builtins.open = self._original_open
+
+    def reset(self):
+        self.db_statements = 0
+        self.file_opens = 0
+        self.file_writes = 0
+
+    def snapshot(self):
+        return {
+            'db_statements': self.db_statements,
+            'file_opens': self.file_opens,
+            'file_writes': self.file_writes
+        }
+
+
+def sign_body(body, channel_secret=BENCH_CHANNEL_SECRET):
+    """
+    依照 LINE 規格計算 X-Line-Signature
+
+    Args:
+        body (str): 請求內容
+        channel_secret (str): 頻道密鑰
+
+    Returns:
+        str: Base64 編碼的 HMAC-SHA256 簽章
+    """
+    digest = hmac.new(channel_secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+def _user_id(rng):
+    return 'U' + uuid.UUID(int=rng.getrandbits(128)).hex
+
+
+def _group_id(index):
+    return 'C' + hashlib.md5(f'bench-group-{index}'.encode('utf-8')).hexdigest()
+
+
+def _base_event(event_type, group_id, user_id=None):
+    source = {'type': 'group', 'groupId': group_id}
+    if user_id:
+        source['userId'] = user_id
+    return {
+        'type': event_type,
+        'mode': 'active',
+        'timestamp': int(time.time() * 1000),
+        'source': source,
+        'webhookEventId': uuid.uuid4().hex.upper(),
+        'deliveryContext': {'isRedelivery': False}
+    }
+
+
+def message_event(group_id, user_id, text):
+    event = _base_event('message', group_id, user_id)
+    event['replyToken'] = uuid.uuid4().hex
+    event['message'] = {'id': str(random.getrandbits(60)), 'type': 'text', 'text': text}
+    return event
+
+
+def member_joined_event(group_id, user_ids):
+    event = _base_event('memberJoined', group_id)
+    event['replyToken'] = uuid.uuid4().hex
+    event['joined'] = {'members': [{'type': 'user', 'userId': uid} for uid in user_ids]}
+    return event
+
+
+def member_left_event(group_id, user_ids):
+    event = _base_event('memberLeft', group_id)
+    event['left'] = {'members': [{'type': 'user', 'userId': uid} for uid in user_ids]}
+    return event
+
+
+def webhook_body(events):
+    return json.dumps({'destination': 'Ubench', 'events': events}, ensure_ascii=False)
+
+
+MESSAGE_TEXTS = ['早安', '今天開會嗎？', '/myid', '/banlist', '收到', '/warn', '晚點再說', '哈哈哈']
+
+
+def scenario_message(rng, count, groups):
+    """一般聊天：多個群組中隨機使用者發送訊息與指令"""
+    for _ in range(count):
+        group_id = _group_id(rng.randrange(groups))
+        yield webhook_body([message_event(group_id, _user_id(rng), rng.choice(MESSAGE_TEXTS))])
+
+
+def scenario_join(rng, count, groups):
+    """成員加入：每次請求一位新成員"""
+    for _ in range(count):
+        group_id = _group_id(rng.randrange(groups))
+        yield webhook_body([member_joined_event(group_id, [_user_id(rng)])])
+
+
+def scenario_leave(rng, count, groups):
+    """成員離開：每次請求一位成員離開"""
+    for _ in range(count):
+        group_id = _group_id(rng.randrange(groups))
+        yield webhook_body([member_left_event(group_id, [_user_id(rng)])])
+
+
+def scenario_raid(rng, count, groups):
+    """
+    翻群突襲：單一群組在短時間內湧入大量帳號、洗版相同訊息並踢出原成員，
+    每個請求都批次帶有多個事件（LINE 會將同時發生的事件合併送出）
+    """
+    group_id = _group_id(0)
+    raiders = [_user_id(rng) for _ in range(max(count, 1))]
+    spam_text = '免費送點數 https://line-gift.example/claim'
+    for index in range(count):
+        raider = raiders[index]
+        events = [
+            member_joined_event(group_id, [raider, _user_id(rng)]),
+            message_event(group_id, raider, spam_text),
+            message_event(group_id, raider, spam_text),
+        ]
+        if index % 4 == 0:
+            events.append(member_left_event(group_id, [_user_id(rng)]))
+        yield webhook_body(events)
+
+
+SCENARIOS = {
+    'message': scenario_message,
+    'join': scenario_join,
+    'leave': scenario_leave,
+    'raid': scenario_raid,
+}
+
+
+def percentile(sorted_values, pct):
+    """以最近排名法計算百分位數"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_scenario(client, name, bodies, io_counter):
+    """
+    送出一組請求並量測結果
+
+    Args:
+        client: Flask test client
+        name (str): 情境名稱
+        bodies (list): 請求內容列表
+        io_counter (IOCounter): I/O 計數器
+
+    Returns:
+        dict: 該情境的量測結果
+    """
+    StubLineBotApi.reset()
+    io_counter.reset()
+    latencies = []
+    errors = 0
+    event_count = 0
+
+    started = time.perf_counter()
+    for body in bodies:
+        event_count += body.count('"webhookEventId"')
+        headers = {'X-Line-Signature': sign_body(body), 'Content-Type': 'application/json'}
+        request_started = time.perf_counter()
+        response = client.post('/callback/', data=body.encode('utf-8'), headers=headers)
+        latencies.append((time.perf_counter() - request_started) * 1000.0)
+        if response.status_code != 200:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    requests_count = len(bodies)
+    return {
+        'scenario': name,
+        'requests': requests_count,
+        'events': event_count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'requests_per_s': round(requests_count / elapsed, 2) if elapsed else 0.0,
+        'events_per_s': round(event_count / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0
+        },
+        'io': io_counter.snapshot(),
+        'line_api_calls': dict(StubLineBotApi.calls)
+    }
+
+
+def load_app(workdir):
+    """
+    在隔離的工作目錄中載入 main.py 的 Flask app，並以替身取代 LineBotApi
+    """
+    os.environ['LINE_CHANNEL_SECRET'] = BENCH_CHANNEL_SECRET
+    os.environ['LINE_CHANNEL_ACCESS_TOKEN'] = BENCH_ACCESS_TOKEN
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(workdir, 'bench.db'))
+
+    import linebot
+    linebot.LineBotApi = StubLineBotApi
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+
+    import main
+    return main.app
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode('utf-8').strip()
+    except Exception:
+        return None
+
+
+def compare_with_baseline(results, baseline_path):
+    """列出與先前結果的吞吐量與 p95 延遲差異"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {item['scenario']: item for item in baseline.get('scenarios', [])}
+
+    lines = []
+    for item in results['scenarios']:
+        old = previous.get(item['scenario'])
+        if not old:
+            continue
+        throughput_delta = _pct_change(old['events_per_s'], item['events_per_s'])
+        p95_delta = _pct_change(old['latency_ms']['p95'], item['latency_ms']['p95'])
+        lines.append(
+            f"{item['scenario']:<8} events/s {old['events_per_s']:>10} -> {item['events_per_s']:>10} ({throughput_delta:+.1f}%)"
+            f"  p95 {old['latency_ms']['p95']:>8} -> {item['latency_ms']['p95']:>8} ms ({p95_delta:+.1f}%)"
+        )
+    return lines
+
+
+def _pct_change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='LINE webhook 壓力測試')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='以逗號分隔的情境名稱')
+    parser.add_argument('--requests', type=int, default=300, help='每個情境送出的請求數')
+    parser.add_argument('--groups', type=int, default=20, help='模擬的群組數量')
+    parser.add_argument('--warmup', type=int, default=20, help='正式量測前的暖身請求數')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default=None, help='JSON 結果輸出路徑')
+    parser.add_argument('--baseline', default=None, help='用來比較的先前 JSON 結果')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的情境：{', '.join(unknown)}")
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    workdir = tempfile.mkdtemp(prefix='webhook-bench-')
+    app = load_app(workdir)
+    client = app.test_client()
+
+    io_counter = IOCounter()
+    io_counter.install()
+    try:
+        rng = random.Random(args.seed)
+        warmup_bodies = list(scenario_message(rng, args.warmup, args.groups))
+        run_scenario(client, 'warmup', warmup_bodies, io_counter)
+
+        scenario_results = []
+        for name in names:
+            bodies = list(SCENARIOS[name](rng, args.requests, args.groups))
+            scenario_results.append(run_scenario(client, name, bodies, io_counter))
+    finally:
+        io_counter.uninstall()
+
+    results = {
+        'benchmark': 'webhook',
+        'created_at': datetime.utcnow().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'requests': args.requests,
+            'groups': args.groups,
+            'warmup': args.warmup,
+            'seed': args.seed
+        },
+        'scenarios': scenario_results
+    }
+
+    for item in scenario_results:
+        latency = item['latency_ms']
+        print(
+            f"{item['scenario']:<8} {item['events_per_s']:>10} events/s  "
+            f"p50 {latency['p50']:>7} ms  p95 {latency['p95']:>7} ms  p99 {latency['p99']:>7} ms  "
+            f"db {item['io']['db_statements']:>6}  files {item['io']['file_opens']:>6}  errors {item['errors']}"
+        )
+
+    if baseline_path:
+        for line in compare_with_baseline(results, baseline_path):
+            print(line)
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {output_path}")
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
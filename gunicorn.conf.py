@@ -0,0 +1,36 @@
+# gunicorn 設定：預設單一 worker，以多執行緒處理 webhook
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
+
+# 防護模式（raid_lockdown）與成員加入異常分數、洗版偵測、指令頻率限制都只存在各程序的記憶體中。
+# 多個 worker 時每個 worker 只看到分到自己的事件：偵測門檻等於被平分，
+# 管理介面解除防護模式也只影響處理該請求的 worker，其他 worker 仍維持防護模式。
+# 因此預設只用一個 worker，以執行緒數調整併發；調高 WEB_CONCURRENCY 前請先確認能接受上述行為。
+# 這取代了原本「預設多個 worker」的設定，多 worker 的併發需等上述狀態移到資料庫或共享儲存後才能恢復。
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# master 先載入 app 再 fork，worker 共用已匯入的模組；
+# 資料庫連線與背景工作在各 worker 第一個請求時才建立
+preload_app = True
+
+# 卡住超過逾時秒數的 worker 會被重啟
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 10
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # 啟動時提醒多 worker 下各程序的偵測狀態互不相通
+    if server.cfg.workers > 1:
+        server.log.warning(
+            "WEB_CONCURRENCY=%s: raid lockdown, anomaly, flood and command-rate state is per worker; "
+            "thresholds are split across workers and an admin lockdown release only reaches one worker",
+            server.cfg.workers,
+        )
@@ -1,13 +1,7 @@
 import os
-from flask import Flask
-from src.webhook import webhook_bp
+from src.app import create_app
 
-app = Flask(__name__)
-app.register_blueprint(webhook_bp)
-
-@app.route("/")
-def home():
-    return "LINE Anti-Takeover Bot is running."
+app = create_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))  # Render 可接受你指定 10000
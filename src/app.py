@@ -0,0 +1,116 @@
+# src/app.py
+import hmac
+import logging
+import os
+import threading
+import time
+from flask import Flask, request, jsonify, send_from_directory
+from src.webhook import webhook_bp, push_to_admins
+from src.routes.admin import admin_bp
+from src.routes.user import user_bp
+from src.models.group import db
+from src.services.roster_sync import start_periodic_roster_sync
+from src.services.audit_retention import start_audit_retention
+from src.services.raid_lockdown import raid_lockdown, start_raid_lockdown_flusher
+from src.services.activity_sweeper import start_activity_sweeper
+from src.utils.database import configure_database, create_tables_and_indexes
+from src.utils.line_client import get_line_bot_api
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+def home():
+    return "LINE Anti-Takeover Bot is running."
+
+def dashboard():
+    return send_from_directory(STATIC_DIR, 'index.html')
+
+def create_app(database_url=None, start_background_jobs=True):
+    """
+    建立 Flask app
+
+    建立時只設定路由與資料庫連線參數，不連線資料庫、不建立 LINE API 客戶端；
+    資料表、索引與背景工作在每個程序收到第一個請求時才初始化，
+    讓 gunicorn 預先載入後 fork 出的 worker 不會共用 master 的連線與執行緒。
+
+    :param database_url: 資料庫連線字串，None 時使用環境變數 DATABASE_URL 或內建 SQLite 檔案
+    :param start_background_jobs: 是否在初始化時啟動名單同步與日誌彙總背景工作
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    configure_database(app, database_url, create_tables=False)
+
+    app.register_blueprint(webhook_bp)
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.add_url_rule("/", view_func=home)
+    app.add_url_rule("/dashboard", view_func=dashboard)
+
+    admin_token = os.environ.get("ADMIN_API_TOKEN")
+    if not admin_token:
+        logger.warning("ADMIN_API_TOKEN is not set, /api endpoints are disabled")
+
+    @app.before_request
+    def require_admin_token():
+        # 未設定 ADMIN_API_TOKEN 時一律拒絕，避免管理介面在預設部署下公開
+        if not request.path.startswith('/api/'):
+            return None
+        if not admin_token:
+            return jsonify({'success': False, 'error': 'Admin API is not configured'}), 503
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8')):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return None
+
+    state = {'ready': False, 'lock': threading.Lock()}
+
+    @app.before_request
+    def lazy_initialize():
+        if state['ready']:
+            return None
+        with state['lock']:
+            if not state['ready']:
+                initialize_app(app, start_background_jobs)
+                state['ready'] = True
+        return None
+
+    logger.info(f"App created in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return app
+
+def initialize_app(app, start_background_jobs=True):
+    """
+    每個程序第一次處理請求前執行的初始化：建立資料表與索引、啟動背景工作
+    :param app: Flask app
+    :param start_background_jobs: 是否啟動背景工作
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        create_tables_and_indexes()
+        db.session.remove()
+
+    # 防護模式的冷卻時間（秒），期間再次觸發會延長
+    raid_lockdown.cooldown_seconds = float(os.environ.get("LOCKDOWN_COOLDOWN_SECONDS", raid_lockdown.cooldown_seconds))
+
+    if start_background_jobs:
+        # 定期寫入防護模式中緩衝的操作日誌並送出合併通知（秒）
+        start_raid_lockdown_flusher(app, push_to_admins, float(os.environ.get("LOCKDOWN_FLUSH_INTERVAL", 5)))
+
+        # 定期以增量模式同步群組成員名單（秒，0 表示停用）
+        roster_sync_interval = int(os.environ.get("ROSTER_SYNC_INTERVAL", 0))
+        if roster_sync_interval > 0:
+            start_periodic_roster_sync(app, get_line_bot_api(), roster_sync_interval)
+
+        # 定期將超過保留天數的操作日誌彙總為每小時統計（秒，0 表示停用）
+        audit_retention_interval = int(os.environ.get("AUDIT_RETENTION_INTERVAL", 3600))
+        audit_retention_days = int(os.environ.get("AUDIT_RETENTION_DAYS", 30))
+        if audit_retention_interval > 0:
+            start_audit_retention(app, audit_retention_interval, audit_retention_days)
+
+        # 定期巡檢所有群組的新操作日誌並通知管理員（秒，0 表示停用）
+        activity_sweep_interval = int(os.environ.get("ACTIVITY_SWEEP_INTERVAL", 60))
+        activity_sweep_workers = int(os.environ.get("ACTIVITY_SWEEP_WORKERS", 4))
+        if activity_sweep_interval > 0:
+            start_activity_sweeper(app, activity_sweep_interval, activity_sweep_workers, push_to_admins)
+
+    logger.info(f"App initialized in pid {os.getpid()} in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -4,6 +4,19 @@ import json
 
 db = SQLAlchemy()
 
+# 列表排序用的運算式：NULL 視為空字串 / 最早時間。
+# 常數直接寫入 SQL 而非綁定參數，查詢才能對應到相同寫法的運算式索引；
+# 時間常數與 DateTime 綁定參數的格式相同（含微秒），以 NULL 列作為分頁游標時才比對得到
+def coalesced_text(column):
+    return db.func.coalesce(column, db.literal_column("''"))
+
+def coalesced_datetime(column):
+    return db.func.coalesce(column, db.literal_column("'1970-01-01 00:00:00.000000'"))
+
+# 不分大小寫的前綴搜尋用：搜尋字串需以 pagination.lower_prefix 轉成相同的小寫規則
+def lowered_text(column):
+    return db.func.lower(coalesced_text(column))
+
 class Group(db.Model):
     __tablename__ = 'groups'
     
@@ -13,6 +26,13 @@ class Group(db.Model):
     threshold = db.Column(db.Integer, default=5)  # 預設1分鐘內允許5人加入
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # 群組列表依名稱或建立時間排序，名稱前綴搜尋不分大小寫（以 group_id 決定同值的順序）
+    __table_args__ = (
+        db.Index('ix_groups_name', coalesced_text(group_name), group_id),
+        db.Index('ix_groups_name_lower', lowered_text(group_name), group_id),
+        db.Index('ix_groups_created_at', coalesced_datetime(created_at), group_id),
+    )
+    
     def __init__(self, group_id, group_name=None, admin_ids=None, threshold=5):
         self.group_id = group_id
         self.group_name = group_name
@@ -65,8 +85,14 @@ class Member(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     is_blocked = db.Column(db.Boolean, default=False)
     
-    # 建立複合唯一索引
-    __table_args__ = (db.UniqueConstraint('user_id', 'group_id', name='unique_user_group'),)
+    # 建立複合唯一索引；成員列表在群組內依顯示名稱、加入時間或使用者ID排序與搜尋
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'group_id', name='unique_user_group'),
+        db.Index('ix_members_group_name', group_id, coalesced_text(display_name), id),
+        db.Index('ix_members_group_name_lower', group_id, lowered_text(display_name), id),
+        db.Index('ix_members_group_joined', group_id, coalesced_datetime(joined_at), id),
+        db.Index('ix_members_group_user', group_id, user_id),
+    )
     
     def __init__(self, user_id, group_id, display_name=None, is_admin=False):
         self.user_id = user_id
@@ -94,6 +120,11 @@ class Blacklist(db.Model):
     reason = db.Column(db.Text, nullable=True)
     blocked_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # 同一使用者在同一範圍（群組或全域）只能有一筆，供批次匯入以 ON CONFLICT 去除重複
+    __table_args__ = (
+        db.Index('unique_blacklist_scope', user_id, db.func.coalesce(group_id, ''), unique=True),
+    )
+    
     def __init__(self, user_id, group_id=None, reason=None):
         self.user_id = user_id
         self.group_id = group_id
@@ -119,6 +150,12 @@ class AuditLog(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     is_suspicious = db.Column(db.Boolean, default=False)
     
+    # 統計查詢依群組與時間範圍篩選，保留期限清理依時間篩選
+    __table_args__ = (
+        db.Index('ix_audit_log_group_timestamp', 'group_id', 'timestamp'),
+        db.Index('ix_audit_log_timestamp', 'timestamp'),
+    )
+    
     def __init__(self, group_id, action, user_id=None, details=None, is_suspicious=False):
         self.group_id = group_id
         self.user_id = user_id
@@ -145,3 +182,110 @@ class AuditLog(db.Model):
             'is_suspicious': self.is_suspicious
         }
 
+
+class GlobalAuditLog(db.Model):
+    __tablename__ = 'global_audit_log'
+
+    # 不屬於任何群組的管理操作（例如全域黑名單批次變更），audit_log 的 group_id 必須對應既有群組
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    action = db.Column(db.String(100), nullable=False)
+    details = db.Column(db.Text, nullable=True)  # JSON格式儲存詳細資訊
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __init__(self, action, details=None):
+        self.action = action
+        self.details = json.dumps(details) if details else None
+
+    def get_details(self):
+        """取得詳細資訊"""
+        return json.loads(self.details) if self.details else {}
+
+    def to_dict(self):
+        return {
+            'log_id': self.log_id,
+            'action': self.action,
+            'details': self.get_details(),
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+        }
+
+
+class KeywordRule(db.Model):
+    __tablename__ = 'keyword_rules'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    group_id = db.Column(db.String(255), nullable=True, index=True)  # NULL表示全域規則
+    pattern = db.Column(db.String(255), nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='keyword')  # keyword 或 domain
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # AUTOINCREMENT 讓 SQLite 不重複使用刪除過的 ID，關鍵字掃描器以 (筆數, 最大 ID) 判斷規則是否變動
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'pattern', 'kind', name='unique_keyword_rule'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    def __init__(self, pattern, group_id=None, kind='keyword'):
+        self.pattern = pattern
+        self.group_id = group_id
+        self.kind = kind
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'group_id': self.group_id,
+            'pattern': self.pattern,
+            'kind': self.kind,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class AuditLogRollup(db.Model):
+    __tablename__ = 'audit_log_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    group_id = db.Column(db.String(255), nullable=False)
+    action = db.Column(db.String(100), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)  # 該小時的起始時間
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    suspicious_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'action', 'hour', name='unique_rollup_bucket'),
+        db.Index('ix_audit_log_rollup_hour', 'hour'),
+    )
+    
+    def __init__(self, group_id, action, hour, event_count=0, suspicious_count=0):
+        self.group_id = group_id
+        self.action = action
+        self.hour = hour
+        self.event_count = event_count
+        self.suspicious_count = suspicious_count
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'group_id': self.group_id,
+            'action': self.action,
+            'hour': self.hour.isoformat() if self.hour else None,
+            'event_count': self.event_count,
+            'suspicious_count': self.suspicious_count
+        }
+
+class GroupSweepState(db.Model):
+    __tablename__ = 'group_sweep_state'
+    
+    group_id = db.Column(db.String(255), primary_key=True)
+    last_log_id = db.Column(db.Integer, nullable=False, default=0)  # 已分析的最大操作日誌ID
+    swept_at = db.Column(db.DateTime, nullable=True)
+    last_alert_at = db.Column(db.DateTime, nullable=True)
+    
+    def __init__(self, group_id, last_log_id=0):
+        self.group_id = group_id
+        self.last_log_id = last_log_id
+    
+    def to_dict(self):
+        return {
+            'group_id': self.group_id,
+            'last_log_id': self.last_log_id,
+            'swept_at': self.swept_at.isoformat() if self.swept_at else None,
+            'last_alert_at': self.last_alert_at.isoformat() if self.last_alert_at else None
+        }
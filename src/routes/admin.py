@@ -1,21 +1,97 @@
-from flask import Blueprint, request, jsonify
-from src.models.group import db, Group, Member, Blacklist, AuditLog
+import io
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import or_
+from src.models.group import db, Group, Member, Blacklist, AuditLog, KeywordRule, coalesced_text, coalesced_datetime, lowered_text
 from src.services.anti_takeover import AntiTakeoverService
+from src.services.anomaly_scorer import anomaly_scorer
+from src.services.keyword_scanner import keyword_scanner
+from src.services.raid_lockdown import raid_lockdown
+from src.services.roster_sync import start_group_sync, get_group_sync
+from src.services.audit_retention import count_activity
+from src.utils.banlist_parser import iter_banlist_rows, USER_ID_PATTERN
+from src.utils.line_client import get_line_bot_api
+from src.utils.pagination import keyset_page, parse_limit, prefix_filter, lower_prefix
 import logging
 
 logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__)
 
+# 列表可用的排序方式：排序運算式與同值時的唯一欄位，皆有對應的索引
+GROUP_SORTS = {
+    'name': (coalesced_text(Group.group_name), Group.group_id),
+    'created_at': (coalesced_datetime(Group.created_at), Group.group_id),
+    'group_id': (Group.group_id, Group.group_id),
+}
+MEMBER_SORTS = {
+    'display_name': (coalesced_text(Member.display_name), Member.id),
+    'joined_at': (coalesced_datetime(Member.joined_at), Member.id),
+    'user_id': (Member.user_id, Member.user_id),
+}
+
+def _flag_arg(name):
+    # 未提供時回傳 None 表示不篩選
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+def _paginated_listing(query, sorts, default_sort):
+    """依 sort / order / limit / cursor 參數取得一頁資料"""
+    sort = request.args.get('sort', default_sort)
+    if sort not in sorts:
+        raise ValueError(f"sort must be one of: {', '.join(sorts)}")
+    order = request.args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    limit = parse_limit(request.args.get('limit'))
+    
+    sort_expression, tiebreak_column = sorts[sort]
+    items, next_cursor = keyset_page(
+        query, sort_expression, tiebreak_column,
+        cursor=request.args.get('cursor') or None,
+        limit=limit,
+        descending=order == 'desc'
+    )
+    return items, {
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
+
 @admin_bp.route('/groups', methods=['GET'])
 def get_groups():
-    """取得所有群組列表"""
+    """
+    取得群組列表（分頁）
+    
+    查詢參數：q（群組名稱前綴，英文字母不分大小寫；或群組ID前綴，需完全相符）、
+    lockdown（只列出防護模式中的群組）、
+    sort（name / created_at / group_id）、order（asc / desc）、limit、cursor
+    """
     try:
-        groups = Group.query.all()
+        query = Group.query
+        
+        search = request.args.get('q', '').strip()
+        if search:
+            query = query.filter(or_(
+                prefix_filter(lowered_text(Group.group_name), lower_prefix(search, db.engine.dialect.name)),
+                prefix_filter(Group.group_id, search)
+            ))
+        
+        if _flag_arg('lockdown'):
+            locked_ids = [item['group_id'] for item in raid_lockdown.active_groups()]
+            query = query.filter(Group.group_id.in_(locked_ids))
+        
+        groups, pagination = _paginated_listing(query, GROUP_SORTS, 'name')
         return jsonify({
             'success': True,
-            'groups': [group.to_dict() for group in groups]
+            'groups': [group.to_dict() for group in groups],
+            'pagination': pagination
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting groups: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -43,17 +119,71 @@ def get_group(group_id):
 
 @admin_bp.route('/groups/<group_id>/members', methods=['GET'])
 def get_group_members(group_id):
-    """取得群組成員列表"""
+    """
+    取得群組成員列表（分頁）
+    
+    查詢參數：q（顯示名稱前綴，英文字母不分大小寫；或使用者ID前綴，需完全相符）、
+    is_admin、is_blocked、
+    sort（display_name / joined_at / user_id）、order（asc / desc）、limit、cursor
+    """
     try:
-        members = Member.query.filter_by(group_id=group_id).all()
+        query = Member.query.filter(Member.group_id == group_id)
+        
+        search = request.args.get('q', '').strip()
+        if search:
+            query = query.filter(or_(
+                prefix_filter(lowered_text(Member.display_name), lower_prefix(search, db.engine.dialect.name)),
+                prefix_filter(Member.user_id, search)
+            ))
+        
+        is_admin = _flag_arg('is_admin')
+        if is_admin is not None:
+            query = query.filter(Member.is_admin == is_admin)
+        
+        is_blocked = _flag_arg('is_blocked')
+        if is_blocked is not None:
+            query = query.filter(Member.is_blocked == is_blocked)
+        
+        members, pagination = _paginated_listing(query, MEMBER_SORTS, 'display_name')
         return jsonify({
             'success': True,
-            'members': [member.to_dict() for member in members]
+            'members': [member.to_dict() for member in members],
+            'pagination': pagination
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting members for group {group_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@admin_bp.route('/groups/<group_id>/members/sync', methods=['POST'])
+def sync_group_members(group_id):
+    """自 LINE 同步群組成員名單（背景執行，以 GET 查詢進度）"""
+    try:
+        full = request.args.get('full', 'false').lower() in ('1', 'true', 'yes')
+        
+        job, started = start_group_sync(current_app._get_current_object(), get_line_bot_api(), group_id, full=full)
+        
+        return jsonify({
+            'success': True,
+            'started': started,
+            'sync': job
+        }), 202
+    except Exception as e:
+        logger.error(f"Error starting member sync for group {group_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/groups/<group_id>/members/sync', methods=['GET'])
+def get_group_members_sync(group_id):
+    """取得群組成員名單同步的進度與結果"""
+    job = get_group_sync(group_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'No sync started for this group'}), 404
+    return jsonify({
+        'success': True,
+        'sync': job
+    })
+
 @admin_bp.route('/groups/<group_id>/blacklist', methods=['GET'])
 def get_group_blacklist(group_id):
     """取得群組黑名單"""
@@ -127,6 +257,7 @@ def update_group_settings(group_id):
             threshold = data['threshold']
             if isinstance(threshold, int) and threshold > 0:
                 group.threshold = threshold
+                anomaly_scorer.configure(group_id, join_floor=threshold)
             else:
                 return jsonify({'success': False, 'error': 'Invalid threshold value'}), 400
         
@@ -201,6 +332,101 @@ def unblock_user(group_id):
         logger.error(f"Error unblocking user in group {group_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+MAX_BATCH_SIZE = 10000
+
+def _batch_user_ids(data):
+    """
+    取出批次請求中的使用者ID，格式檢查與匯入端點相同
+    :return: (有效的ID列表, 格式錯誤的數量, 錯誤訊息)
+    """
+    user_ids = data.get('user_ids') if data else None
+    if not isinstance(user_ids, list) or not user_ids:
+        return None, 0, 'user_ids must be a non-empty list'
+    if len(user_ids) > MAX_BATCH_SIZE:
+        return None, 0, f'At most {MAX_BATCH_SIZE} user_ids per batch, use the import endpoint for larger lists'
+    valid_ids = [
+        user_id.strip() for user_id in user_ids
+        if isinstance(user_id, str) and USER_ID_PATTERN.match(user_id.strip())
+    ]
+    return valid_ids, len(user_ids) - len(valid_ids), None
+
+def _missing_group_response(group_id):
+    # 只處理已知群組，不為網址中任意的群組ID建立資料
+    if group_id is not None and db.session.get(Group, group_id) is None:
+        return jsonify({'success': False, 'error': 'Group not found'}), 404
+    return None
+
+@admin_bp.route('/blacklist/block', methods=['POST'])
+@admin_bp.route('/groups/<group_id>/block/batch', methods=['POST'])
+def block_users_batch(group_id=None):
+    """批次封鎖使用者（未指定群組時加入全域黑名單）"""
+    try:
+        missing = _missing_group_response(group_id)
+        if missing:
+            return missing
+        
+        data = request.get_json()
+        user_ids, invalid, error = _batch_user_ids(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        anti_takeover_service = AntiTakeoverService(None)
+        result = anti_takeover_service.block_users(group_id, user_ids, data.get('reason', ''), invalid=invalid)
+        
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error batch blocking users for {group_id or 'global'}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/blacklist/unblock', methods=['POST'])
+@admin_bp.route('/groups/<group_id>/unblock/batch', methods=['POST'])
+def unblock_users_batch(group_id=None):
+    """批次解除封鎖使用者（未指定群組時自全域黑名單移除）"""
+    try:
+        missing = _missing_group_response(group_id)
+        if missing:
+            return missing
+        
+        data = request.get_json()
+        user_ids, invalid, error = _batch_user_ids(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        anti_takeover_service = AntiTakeoverService(None)
+        result = anti_takeover_service.unblock_users(group_id, user_ids, invalid=invalid)
+        
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error batch unblocking users for {group_id or 'global'}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/blacklist/import', methods=['POST'])
+@admin_bp.route('/groups/<group_id>/blacklist/import', methods=['POST'])
+def import_blacklist(group_id=None):
+    """串流匯入共享封鎖名單（CSV 或 NDJSON）"""
+    try:
+        missing = _missing_group_response(group_id)
+        if missing:
+            return missing
+        
+        content_type = (request.mimetype or '').lower()
+        fmt = request.args.get('format') or ('ndjson' if 'ndjson' in content_type or 'jsonl' in content_type else 'csv')
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', errors='replace', newline='')
+        
+        anti_takeover_service = AntiTakeoverService(None)
+        result = anti_takeover_service.import_blacklist(group_id, iter_banlist_rows(lines, fmt))
+        
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing blacklist for {group_id or 'global'}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @admin_bp.route('/groups/<group_id>/analyze', methods=['GET'])
 def analyze_group_activity(group_id):
     """分析群組活動"""
@@ -218,6 +444,119 @@ def analyze_group_activity(group_id):
         logger.error(f"Error analyzing group activity {group_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@admin_bp.route('/lockdowns', methods=['GET'])
+def get_lockdowns():
+    """取得所有在防護模式中的群組"""
+    return jsonify({
+        'success': True,
+        'lockdowns': raid_lockdown.active_groups()
+    })
+
+@admin_bp.route('/groups/<group_id>/lockdown', methods=['POST'])
+def enter_lockdown(group_id):
+    """手動讓群組進入防護模式（已在防護模式中則延長冷卻時間）"""
+    entered = raid_lockdown.enter(group_id, 'manual')
+    return jsonify({
+        'success': True,
+        'entered': entered,
+        'lockdown': raid_lockdown.status(group_id)
+    })
+
+@admin_bp.route('/groups/<group_id>/lockdown', methods=['DELETE'])
+def exit_lockdown(group_id):
+    """手動解除群組的防護模式"""
+    if not raid_lockdown.exit(group_id):
+        return jsonify({'success': False, 'error': 'Group is not in lockdown'}), 404
+    return jsonify({'success': True})
+
+@admin_bp.route('/keywords', methods=['GET'])
+@admin_bp.route('/groups/<group_id>/keywords', methods=['GET'])
+def get_keyword_rules(group_id=None):
+    """取得關鍵字與網域封鎖規則（未指定群組時為全域規則）"""
+    try:
+        rules = KeywordRule.query.filter_by(group_id=group_id).order_by(KeywordRule.id).all()
+        return jsonify({
+            'success': True,
+            'rules': [rule.to_dict() for rule in rules]
+        })
+    except Exception as e:
+        logger.error(f"Error getting keyword rules for {group_id or 'global'}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/keywords', methods=['POST'])
+@admin_bp.route('/groups/<group_id>/keywords', methods=['POST'])
+def add_keyword_rules(group_id=None):
+    """新增關鍵字或網域封鎖規則，可一次新增多筆"""
+    try:
+        data = request.get_json() or {}
+        kind = data.get('kind', 'keyword')
+        patterns = data.get('patterns')
+        if patterns is None and data.get('pattern'):
+            patterns = [data['pattern']]
+        
+        if kind not in ('keyword', 'domain'):
+            return jsonify({'success': False, 'error': 'kind must be keyword or domain'}), 400
+        if not isinstance(patterns, list) or not patterns:
+            return jsonify({'success': False, 'error': 'pattern or patterns is required'}), 400
+        
+        # 去除空白與重複
+        cleaned = []
+        for pattern in patterns:
+            if isinstance(pattern, str) and pattern.strip() and pattern.strip() not in cleaned:
+                cleaned.append(pattern.strip()[:255])
+        
+        existing = {
+            rule.pattern for rule in KeywordRule.query.filter(
+                KeywordRule.group_id.is_(None) if group_id is None else KeywordRule.group_id == group_id,
+                KeywordRule.kind == kind,
+                KeywordRule.pattern.in_(cleaned)
+            )
+        }
+        new_rules = [
+            KeywordRule(pattern=pattern, group_id=group_id, kind=kind)
+            for pattern in cleaned if pattern not in existing
+        ]
+        db.session.add_all(new_rules)
+        
+        if group_id and new_rules:
+            db.session.add(AuditLog(
+                group_id=group_id,
+                action='keywords_added',
+                details={'kind': kind, 'count': len(new_rules)}
+            ))
+        db.session.commit()
+        
+        keyword_scanner.add_rules(new_rules)
+        
+        return jsonify({
+            'success': True,
+            'added': len(new_rules),
+            'skipped': len(cleaned) - len(new_rules)
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error adding keyword rules for {group_id or 'global'}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/keywords/<int:rule_id>', methods=['DELETE'])
+def delete_keyword_rule(rule_id):
+    """刪除關鍵字或網域封鎖規則"""
+    try:
+        rule = db.session.get(KeywordRule, rule_id)
+        if not rule:
+            return jsonify({'success': False, 'error': 'Rule not found'}), 404
+        
+        db.session.delete(rule)
+        db.session.commit()
+        
+        keyword_scanner.remove_rules([rule_id])
+        
+        return jsonify({'success': True, 'message': 'Rule deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting keyword rule {rule_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @admin_bp.route('/statistics', methods=['GET'])
 def get_overall_statistics():
     """取得整體統計資訊"""
@@ -226,17 +565,15 @@ def get_overall_statistics():
         total_members = Member.query.count()
         total_blacklist = Blacklist.query.count()
         
-        # 最近24小時的活動
+        # 最近24小時與30天的活動（較舊的範圍來自每小時彙總）
         from datetime import datetime, timedelta
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_activity = AuditLog.query.filter(
-            AuditLog.timestamp >= yesterday
-        ).count()
-        
-        suspicious_activity = AuditLog.query.filter(
-            AuditLog.timestamp >= yesterday,
-            AuditLog.is_suspicious == True
-        ).count()
+        now = datetime.utcnow()
+        yesterday = now - timedelta(days=1)
+        last_month = now - timedelta(days=30)
+        recent_activity = count_activity(yesterday)
+        suspicious_activity = count_activity(yesterday, suspicious_only=True)
+        activity_30d = count_activity(last_month)
+        suspicious_activity_30d = count_activity(last_month, suspicious_only=True)
         
         return jsonify({
             'success': True,
@@ -245,7 +582,9 @@ def get_overall_statistics():
                 'total_members': total_members,
                 'total_blacklist': total_blacklist,
                 'recent_activity_24h': recent_activity,
-                'suspicious_activity_24h': suspicious_activity
+                'suspicious_activity_24h': suspicious_activity,
+                'activity_30d': activity_30d,
+                'suspicious_activity_30d': suspicious_activity_30d
             }
         })
     except Exception as e:
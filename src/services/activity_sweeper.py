@@ -0,0 +1,293 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func, case, update, bindparam
+from src.models.group import db, Group, AuditLog, GroupSweepState
+from src.services.anomaly_scorer import anomaly_scorer
+from src.services.anti_takeover import AntiTakeoverService, LOCKDOWN_SUSPICIOUS_EVENTS
+from src.services.raid_lockdown import raid_lockdown
+from src.utils.bulk import insert_ignore, chunked
+from src.utils.line_client import get_line_bot_api
+
+logger = logging.getLogger(__name__)
+
+# 巡檢自己產生的日誌不算群組活動
+IGNORED_ACTIONS = ('admin_notification',)
+
+
+def _suspicious_sum():
+    return func.sum(case((AuditLog.is_suspicious == True, 1), else_=0))
+
+
+class ActivitySweeper:
+    """
+    跨群組可疑活動背景巡檢
+
+    每輪只讀取全域游標之後新增的操作日誌並依群組彙總，沒有新事件的群組完全不處理；
+    只有一般事件的群組只推進已分析位置，有可疑事件的群組才交給固定大小的執行緒池分析。
+    每個群組以 GroupSweepState.last_log_id 記錄已分析的位置，並以比較後更新
+    （compare-and-set）取得新的區間，多個程序同時巡檢也不會重複通知。
+
+    分析時統計群組在滾動時間窗口內的事件，而非只看本輪新增的部分，
+    每輪只有一兩筆可疑事件的緩慢突襲也會在窗口內累計到門檻。
+    全域游標只推進到 commit_lag 之前的日誌：PostgreSQL 的序號不保證依 commit 順序可見，
+    較晚 commit 的較小 ID 仍會在之後的巡檢中讀到。
+    """
+
+    def __init__(self, app, max_workers=4, min_suspicious_events=3,
+                 alert_cooldown_seconds=900, lookback_seconds=600,
+                 window_seconds=300, commit_lag_seconds=30, notifier=None):
+        self.app = app
+        # 群組沒有設定管理員或通知失敗時改用的通知函式（例如通知全域管理員的 push_to_admins）
+        self.notifier = notifier
+        self.min_suspicious_events = min_suspicious_events
+        self.alert_cooldown = timedelta(seconds=alert_cooldown_seconds)
+        self.lookback = timedelta(seconds=lookback_seconds)
+        self.window = timedelta(seconds=window_seconds)
+        self.commit_lag = timedelta(seconds=commit_lag_seconds)
+        self._cursor = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='activity-sweep')
+
+    def sweep(self, now=None):
+        """
+        執行一輪巡檢（需在 app context 中呼叫）
+
+        Returns:
+            dict: 本輪的新事件、活躍群組、分析群組與發現的數量
+        """
+        now = now or datetime.utcnow()
+        if self._cursor is None:
+            self._cursor = self._initial_cursor(now)
+        cursor = self._cursor
+
+        activity = self._collect_activity(cursor)
+        result = {
+            'cursor': cursor,
+            'new_events': sum(item['events'] for item in activity.values()),
+            'active_groups': len(activity),
+            'analyzed_groups': 0,
+            'findings': []
+        }
+        if not activity:
+            return result
+
+        watermarks = self._load_watermarks(sorted(activity), cursor)
+
+        quiet = []
+        candidates = []
+        for group_id, item in activity.items():
+            stored = watermarks.get(group_id, cursor)
+            if stored >= item['max_log_id']:
+                continue  # 其他程序已處理
+            if item['suspicious'] or self._is_anomalous(group_id):
+                candidates.append((group_id, stored, max(stored, cursor), item['max_log_id']))
+            else:
+                quiet.append({'b_group_id': group_id, 'b_last_log_id': item['max_log_id']})
+
+        self._advance(quiet, now)
+
+        futures = [self._executor.submit(self._analyze_in_context, *candidate, now) for candidate in candidates]
+        for future in futures:
+            finding = future.result()
+            if finding:
+                result['findings'].append(finding)
+
+        result['analyzed_groups'] = len(candidates)
+        self._cursor = self._settled_cursor(cursor, now)
+        return result
+
+    def shutdown(self):
+        """停止執行緒池"""
+        self._executor.shutdown(wait=True)
+
+    def _initial_cursor(self, now):
+        # 程序啟動時只回頭看 lookback 內的事件，不重新分析整個歷史
+        cursor = db.session.query(func.max(AuditLog.log_id)).filter(
+            AuditLog.timestamp < now - self.lookback
+        ).scalar()
+        return cursor or 0
+
+    def _settled_cursor(self, cursor, now):
+        # 只推進到 commit_lag 之前寫入的日誌，之後的日誌下一輪會再讀一次（已分析的群組由高水位略過）
+        settled = db.session.query(func.max(AuditLog.log_id)).filter(
+            AuditLog.log_id > cursor,
+            AuditLog.timestamp < now - self.commit_lag
+        ).scalar()
+        return settled or cursor
+
+    def _collect_activity(self, cursor):
+        rows = db.session.query(
+            AuditLog.group_id,
+            func.max(AuditLog.log_id),
+            func.count(AuditLog.log_id),
+            _suspicious_sum()
+        ).filter(
+            AuditLog.log_id > cursor,
+            AuditLog.action.notin_(IGNORED_ACTIONS)
+        ).group_by(AuditLog.group_id).all()
+
+        return {
+            group_id: {'max_log_id': max_log_id, 'events': events, 'suspicious': int(suspicious or 0)}
+            for group_id, max_log_id, events, suspicious in rows
+        }
+
+    def _load_watermarks(self, group_ids, cursor):
+        watermarks = {}
+        for chunk in chunked(group_ids):
+            db.session.execute(insert_ignore(GroupSweepState), [
+                {'group_id': group_id, 'last_log_id': cursor} for group_id in chunk
+            ])
+            db.session.commit()
+            watermarks.update(
+                db.session.query(GroupSweepState.group_id, GroupSweepState.last_log_id)
+                .filter(GroupSweepState.group_id.in_(chunk))
+            )
+        return watermarks
+
+    def _advance(self, rows, now):
+        # 只推進、不倒退，與其他程序的更新衝突時以較大的位置為準
+        if not rows:
+            return
+        table = GroupSweepState.__table__
+        statement = update(table).where(
+            table.c.group_id == bindparam('b_group_id'),
+            table.c.last_log_id < bindparam('b_last_log_id')
+        ).values(last_log_id=bindparam('b_last_log_id'), swept_at=now)
+        for chunk in chunked(rows):
+            db.session.connection().execute(statement, chunk)
+            db.session.commit()
+
+    def _is_anomalous(self, group_id):
+        anomaly = anomaly_scorer.snapshot(group_id)
+        return bool(anomaly and anomaly['is_anomalous'])
+
+    def _analyze_in_context(self, group_id, stored, start, end, now):
+        with self.app.app_context():
+            try:
+                return self._analyze_group(group_id, stored, start, end, now)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error sweeping group {group_id}: {e}")
+                return None
+            finally:
+                db.session.remove()
+
+    def _analyze_group(self, group_id, stored, start, end, now):
+        table = GroupSweepState.__table__
+        claimed = db.session.connection().execute(
+            update(table)
+            .where(table.c.group_id == group_id, table.c.last_log_id == stored)
+            .values(last_log_id=end, swept_at=now)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return None
+
+        # 以時間窗口統計，未達門檻的事件留待之後的新事件一起累計
+        rows = db.session.query(
+            AuditLog.action,
+            func.count(AuditLog.log_id),
+            _suspicious_sum()
+        ).filter(
+            AuditLog.group_id == group_id,
+            AuditLog.timestamp >= now - self.window,
+            AuditLog.action.notin_(IGNORED_ACTIONS)
+        ).group_by(AuditLog.action).all()
+
+        actions = {action: {'events': events, 'suspicious': int(suspicious or 0)} for action, events, suspicious in rows}
+        suspicious_events = sum(item['suspicious'] for item in actions.values())
+        anomaly = anomaly_scorer.snapshot(group_id)
+        is_anomalous = bool(anomaly and anomaly['is_anomalous'])
+
+        if suspicious_events < self.min_suspicious_events and not is_anomalous:
+            return None
+
+        if is_anomalous or suspicious_events >= LOCKDOWN_SUSPICIOUS_EVENTS:
+            raid_lockdown.enter(group_id, 'sweeper')
+
+        finding = {
+            'group_id': group_id,
+            'from_log_id': start,
+            'to_log_id': end,
+            'total_events': sum(item['events'] for item in actions.values()),
+            'suspicious_events': suspicious_events,
+            'actions': actions,
+            'anomaly': anomaly,
+            'notified': False
+        }
+
+        state = db.session.get(GroupSweepState, group_id)
+        if state.last_alert_at and now - state.last_alert_at < self.alert_cooldown:
+            return finding
+
+        # 只有實際送出通知才開始冷卻時間，沒有送達任何人時下一輪會再嘗試
+        if not self._notify(group_id, self._format_finding(finding)):
+            return finding
+        finding['notified'] = True
+        state.last_alert_at = now
+        db.session.commit()
+        return finding
+
+    def _notify(self, group_id, message):
+        group = db.session.get(Group, group_id)
+        if group and AntiTakeoverService(get_line_bot_api()).notify_admins(group, message):
+            return True
+        if self.notifier is None:
+            return False
+        name = group.group_name if group and group.group_name else group_id
+        return bool(self.notifier(f"[防翻群警報] {name}\n\n{message}"))
+
+    def _format_finding(self, finding):
+        minutes = int(self.window.total_seconds() // 60)
+        lines = [
+            f"背景巡檢發現可疑活動：最近 {minutes} 分鐘內事件 {finding['total_events']} 筆，"
+            f"其中可疑 {finding['suspicious_events']} 筆"
+        ]
+        for action, item in sorted(finding['actions'].items(), key=lambda entry: -entry[1]['events']):
+            line = f"- {action}：{item['events']}"
+            if item['suspicious']:
+                line += f"（可疑 {item['suspicious']}）"
+            lines.append(line)
+        anomaly = finding['anomaly']
+        if anomaly and anomaly['is_anomalous']:
+            lines.append(f"活動量顯著高於群組基準（score {anomaly['score']}）")
+        return "\n".join(lines)
+
+
+def start_activity_sweeper(app, interval_seconds, max_workers=4, notifier=None):
+    """
+    啟動背景執行緒，定期巡檢所有群組
+
+    Args:
+        app (Flask): Flask app，用於建立 app context
+        interval_seconds (int): 巡檢間隔（秒）
+        max_workers (int): 分析群組的執行緒數量上限
+        notifier (callable): 群組沒有管理員可通知時改用的通知函式
+
+    Returns:
+        threading.Event: 設定後即停止
+    """
+    stop_event = threading.Event()
+    sweeper = ActivitySweeper(app, max_workers=max_workers, notifier=notifier)
+
+    def run():
+        while not stop_event.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    result = sweeper.sweep()
+                    if result['active_groups']:
+                        logger.info(
+                            f"Activity sweep: {result['new_events']} new events in {result['active_groups']} groups, "
+                            f"{result['analyzed_groups']} analyzed, {len(result['findings'])} findings"
+                        )
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Activity sweep failed: {e}")
+                finally:
+                    db.session.remove()
+        sweeper.shutdown()
+
+    thread = threading.Thread(target=run, name='activity-sweeper', daemon=True)
+    thread.start()
+    return stop_event
@@ -0,0 +1,241 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 各訊號的預設參數：fast_window 為短期速率的時間常數（秒），
+# min_events 為暖機完成後觸發警報所需的最少事件數，
+# cold_floor 為群組尚無基準時的保守門檻
+SIGNAL_DEFAULTS = {
+    'join': {'fast_window': 60.0, 'min_events': 3, 'cold_floor': 5},
+    'leave': {'fast_window': 60.0, 'min_events': 3, 'cold_floor': 5},
+    'kick': {'fast_window': 60.0, 'min_events': 2, 'cold_floor': 3},
+    'message': {'fast_window': 60.0, 'min_events': 20, 'cold_floor': 60},
+    'command': {'fast_window': 60.0, 'min_events': 8, 'cold_floor': 15},
+}
+
+
+class _SignalState:
+    """單一訊號的指數衰減計數器"""
+
+    __slots__ = ('fast', 'slow', 'updated_at', 'floor', 'configured')
+
+    def __init__(self, now, floor, configured=False):
+        self.fast = 0.0
+        self.slow = 0.0
+        self.updated_at = now
+        self.floor = floor
+        # 管理員設定的門檻在暖機後仍然有效
+        self.configured = configured
+
+    def decay(self, now, fast_window, baseline_window):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.fast *= math.exp(-elapsed / fast_window)
+            self.slow *= math.exp(-elapsed / baseline_window)
+            self.updated_at = now
+
+
+class _GroupState:
+    """單一群組的所有訊號狀態，記憶體大小固定"""
+
+    __slots__ = ('first_seen', 'signals')
+
+    def __init__(self, now, floors):
+        self.first_seen = now
+        self.signals = {
+            signal: _SignalState(now, floors.get(signal, params['cold_floor']), signal in floors)
+            for signal, params in SIGNAL_DEFAULTS.items()
+        }
+
+
+class AnomalyScorer:
+    """
+    串流式多訊號異常評分引擎
+
+    以指數衰減計數器追蹤每個群組的加入、離開、踢人、訊息與指令速率：
+    短期計數器代表最近約一分鐘的活動量，長期計數器則為該群組自身的基準。
+    每個事件以 O(1) 更新，不讀取資料庫；當短期活動量顯著高於群組自身基準時發出警報，
+    因此活躍的大群組不會被誤判，而小群組能更早受到保護。
+    """
+
+    def __init__(self, baseline_window=3600.0, warmup_seconds=600.0, z_threshold=3.0, max_groups=10000,
+                 floor_loader=None, floor_refresh_seconds=60.0):
+        self.baseline_window = baseline_window
+        self.warmup_seconds = warmup_seconds
+        self.z_threshold = z_threshold
+        self.max_groups = max_groups
+        # floor_loader(group_id) 回傳 {'join': 門檻} 或 None；不論第一個事件是哪種訊號都會載入，
+        # 並定期重新載入，讓其他程序修改的設定也能生效
+        self.floor_loader = floor_loader
+        self.floor_refresh_seconds = floor_refresh_seconds
+        self._groups = OrderedDict()
+        self._floors = {}
+        self._floors_loaded_at = {}
+        self._lock = threading.Lock()
+
+    def configure(self, group_id, join_floor=None):
+        """
+        設定群組的加入門檻（對應 Group.threshold）：暖機期間作為固定門檻，
+        暖機後短期加入人數也需超過此門檻才會發出警報
+
+        Args:
+            group_id (str): 群組ID
+            join_floor (int): 加入人數門檻
+        """
+        with self._lock:
+            if join_floor is not None:
+                self._floors.setdefault(group_id, {})['join'] = join_floor
+                state = self._groups.get(group_id)
+                if state:
+                    state.signals['join'].floor = join_floor
+                    state.signals['join'].configured = True
+
+    def is_tracked(self, group_id):
+        """檢查群組是否已有評分狀態"""
+        return group_id in self._groups
+
+    def observe(self, group_id, signal, count=1, now=None):
+        """
+        記錄一個事件並評估是否異常
+
+        Args:
+            group_id (str): 群組ID
+            signal (str): 訊號類型（join, leave, kick, message, command）
+            count (int): 事件數量（例如一次加入的人數）
+            now (float): 事件時間（秒），預設為目前時間
+
+        Returns:
+            dict: 評分結果
+        """
+        if signal not in SIGNAL_DEFAULTS:
+            raise ValueError(f"Unknown signal: {signal}")
+
+        now = time.time() if now is None else now
+        if self.floor_loader is not None:
+            self._refresh_floors(group_id)
+
+        with self._lock:
+            state = self._get_state(group_id, now)
+            signal_state = state.signals[signal]
+            signal_state.decay(now, SIGNAL_DEFAULTS[signal]['fast_window'], self.baseline_window)
+
+            result = self._score(state, signal, signal_state, now, signal_state.fast + count)
+
+            signal_state.fast += count
+            # 異常期間的事件只以門檻速率計入基準：短暫的攻擊幾乎不會拉高基準，
+            # 持續一段時間的新活動量則會逐步成為新的基準
+            if result['is_anomalous']:
+                expected = self._expected(state, signal, signal_state, now)
+                limit = expected + self.z_threshold * math.sqrt(expected + 1.0)
+                signal_state.slow += count * min(1.0, limit / (signal_state.fast or 1.0))
+            else:
+                signal_state.slow += count
+
+        return result
+
+    def snapshot(self, group_id, now=None):
+        """
+        取得群組目前各訊號的評分，不記錄新事件
+
+        Args:
+            group_id (str): 群組ID
+            now (float): 評估時間（秒），預設為目前時間
+
+        Returns:
+            dict: 各訊號評分與整體是否異常；群組尚未被追蹤時回傳 None
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            state = self._groups.get(group_id)
+            if state is None:
+                return None
+
+            signals = {}
+            for signal, signal_state in state.signals.items():
+                signal_state.decay(now, SIGNAL_DEFAULTS[signal]['fast_window'], self.baseline_window)
+                signals[signal] = self._score(state, signal, signal_state, now, signal_state.fast)
+
+        return {
+            'group_id': group_id,
+            'is_anomalous': any(item['is_anomalous'] for item in signals.values()),
+            'warmed_up': now - state.first_seen >= self.warmup_seconds,
+            'signals': signals
+        }
+
+    def forget(self, group_id):
+        """移除群組的評分狀態"""
+        with self._lock:
+            self._groups.pop(group_id, None)
+            self._floors.pop(group_id, None)
+            self._floors_loaded_at.pop(group_id, None)
+
+    def _refresh_floors(self, group_id):
+        loaded_at = self._floors_loaded_at.get(group_id)
+        current = time.monotonic()
+        if loaded_at is not None and current - loaded_at < self.floor_refresh_seconds:
+            return
+        # 先標記，避免同一群組的並行事件重複載入；載入在鎖外進行
+        self._floors_loaded_at[group_id] = current
+        try:
+            floors = self.floor_loader(group_id)
+        except Exception as e:
+            logger.warning(f"Could not load anomaly floors for group {group_id}: {e}")
+            return
+        if floors:
+            self.configure(group_id, join_floor=floors.get('join'))
+
+    def _get_state(self, group_id, now):
+        state = self._groups.get(group_id)
+        if state is None:
+            state = _GroupState(now, self._floors.get(group_id, {}))
+            self._groups[group_id] = state
+            # 超過上限時淘汰最久未活動的群組，維持固定記憶體
+            while len(self._groups) > self.max_groups:
+                evicted_id, _ = self._groups.popitem(last=False)
+                self._floors.pop(evicted_id, None)
+                self._floors_loaded_at.pop(evicted_id, None)
+        else:
+            self._groups.move_to_end(group_id)
+        return state
+
+    def _expected(self, state, signal, signal_state, now):
+        # 依長期基準估計一個短期窗口內應有的事件數；
+        # 長期計數器在觀察時間不足時會低估，依已觀察時間修正
+        fast_window = SIGNAL_DEFAULTS[signal]['fast_window']
+        age = now - state.first_seen
+        coverage = 1.0 - math.exp(-max(age, self.warmup_seconds, fast_window) / self.baseline_window)
+        return signal_state.slow / coverage * (fast_window / self.baseline_window)
+
+    def _score(self, state, signal, signal_state, now, current):
+        fast_window = SIGNAL_DEFAULTS[signal]['fast_window']
+        warmed_up = now - state.first_seen >= self.warmup_seconds
+
+        expected = self._expected(state, signal, signal_state, now)
+        score = (current - expected) / math.sqrt(expected + 1.0)
+
+        if warmed_up:
+            if signal_state.configured:
+                floor = signal_state.floor
+            else:
+                floor = SIGNAL_DEFAULTS[signal]['min_events']
+            is_anomalous = current > floor and score >= self.z_threshold
+        else:
+            # 暖機期間基準尚不可靠，沿用固定門檻
+            is_anomalous = current > signal_state.floor
+
+        return {
+            'signal': signal,
+            'is_anomalous': is_anomalous,
+            'score': round(score, 3),
+            'rate_per_min': round(current * 60.0 / fast_window, 3),
+            'baseline_per_min': round(expected * 60.0 / fast_window, 3),
+            'warmed_up': warmed_up
+        }
+
+
+anomaly_scorer = AnomalyScorer()
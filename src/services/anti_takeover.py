@@ -2,10 +2,20 @@ import logging
 from datetime import datetime, timedelta
 from linebot.exceptions import LineBotApiError
 from linebot.models import TextSendMessage
-from src.models.group import db, Group, Member, Blacklist, AuditLog
+from src.models.group import db, Group, Member, Blacklist, AuditLog, GlobalAuditLog
+from src.services.anomaly_scorer import anomaly_scorer
+from src.services.audit_retention import count_activity
+from src.services.raid_lockdown import raid_lockdown
+from src.utils.bulk import insert_ignore, chunked
 
 logger = logging.getLogger(__name__)
 
+# 已確認存在於資料庫的群組，避免每次寫入日誌都查詢 groups 表
+_known_group_ids = set()
+
+# 分析時窗內的可疑事件達到此數量即進入防護模式
+LOCKDOWN_SUSPICIOUS_EVENTS = 10
+
 class AntiTakeoverService:
     """防翻群服務類別"""
     
@@ -24,33 +34,18 @@ class AntiTakeoverService:
             bool: 是否為異常大量加入
         """
         try:
-            # 取得群組設定
-            group = Group.query.filter_by(group_id=group_id).first()
-            if not group:
-                return False
-            
-            threshold = group.threshold
+            # 群組設定的加入門檻由 load_group_floors 載入，見模組底部
+            result = anomaly_scorer.observe(group_id, 'join', new_member_count)
             
-            # 檢查過去1分鐘內的加入事件
-            one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
-            recent_joins = AuditLog.query.filter(
-                AuditLog.group_id == group_id,
-                AuditLog.action == 'member_join',
-                AuditLog.timestamp >= one_minute_ago
-            ).all()
-            
-            # 計算過去1分鐘內加入的總人數
-            total_recent_joins = sum([
-                len(log.get_details().get('member_ids', [])) 
-                for log in recent_joins
-            ])
-            
-            # 加上當前加入的人數
-            total_joins = total_recent_joins + new_member_count
+            logger.info(
+                f"Group {group_id}: join rate {result['rate_per_min']}/min "
+                f"(baseline: {result['baseline_per_min']}/min, score: {result['score']})"
+            )
             
-            logger.info(f"Group {group_id}: {total_joins} joins in last minute (threshold: {threshold})")
+            if result['is_anomalous']:
+                raid_lockdown.enter(group_id, 'mass_join')
             
-            return total_joins > threshold
+            return result['is_anomalous']
             
         except Exception as e:
             logger.error(f"Error checking mass join: {e}")
@@ -69,16 +64,10 @@ class AntiTakeoverService:
                 # 注意：LINE Bot API目前不支援直接踢人功能
                 # 這裡只是示範，實際上需要群組管理員手動操作
                 logger.warning(f"Cannot kick user {user_id} from group {group_id}: API limitation")
+                anomaly_scorer.observe(group_id, 'kick')
                 
                 # 記錄嘗試踢人的事件
-                log = AuditLog(
-                    group_id=group_id,
-                    user_id=user_id,
-                    action='kick_attempt',
-                    details={'reason': 'blacklisted_user'}
-                )
-                db.session.add(log)
-                db.session.commit()
+                self.write_audit_log(group_id, user_id, 'kick_attempt', {'reason': 'blacklisted_user'})
             
         except LineBotApiError as e:
             logger.error(f"LINE Bot API error when kicking user: {e}")
@@ -167,6 +156,131 @@ class AntiTakeoverService:
             logger.error(f"Error unblocking user: {e}")
             return False
     
+    def block_users(self, group_id, user_ids, reason=None, invalid=0):
+        """
+        批次封鎖使用者
+        
+        Args:
+            group_id (str): 群組ID，None 表示全域黑名單
+            user_ids (list): 使用者ID列表（已通過格式檢查）
+            reason (str): 封鎖原因
+            invalid (int): 呼叫端因ID格式錯誤而剔除的數量
+            
+        Returns:
+            dict: 新增、略過（已存在或重複）與無效的數量
+        """
+        entries = [(user_id, reason) for user_id in user_ids]
+        inserted = self._insert_blacklist_entries(group_id, entries)
+        skipped = len(entries) - inserted
+        
+        self._log_blacklist_batch(group_id, 'users_blocked', {
+            'reason': reason,
+            'inserted': inserted,
+            'skipped': skipped,
+            'invalid': invalid
+        })
+        
+        return {'inserted': inserted, 'skipped': skipped, 'invalid': invalid}
+    
+    def unblock_users(self, group_id, user_ids, invalid=0):
+        """
+        批次解除封鎖使用者
+        
+        Args:
+            group_id (str): 群組ID，None 表示全域黑名單
+            user_ids (list): 使用者ID列表（已通過格式檢查）
+            invalid (int): 呼叫端因ID格式錯誤而剔除的數量
+            
+        Returns:
+            dict: 移除、略過（不在黑名單中）與無效的數量
+        """
+        unique_ids = list(dict.fromkeys(user_ids))
+        scope = Blacklist.group_id.is_(None) if group_id is None else Blacklist.group_id == group_id
+        
+        removed = 0
+        for chunk in chunked(unique_ids):
+            result = db.session.connection().execute(
+                Blacklist.__table__.delete().where(scope, Blacklist.user_id.in_(chunk))
+            )
+            removed += result.rowcount
+            db.session.commit()
+        skipped = len(user_ids) - removed
+        
+        self._log_blacklist_batch(group_id, 'users_unblocked', {
+            'removed': removed,
+            'skipped': skipped,
+            'invalid': invalid
+        })
+        
+        return {'removed': removed, 'skipped': skipped, 'invalid': invalid}
+    
+    def import_blacklist(self, group_id, rows, batch_size=1000):
+        """
+        串流匯入共享封鎖名單
+        
+        Args:
+            group_id (str): 群組ID，None 表示全域黑名單
+            rows (iterable): 逐筆產生 (user_id, reason)，無效的行為 None
+            batch_size (int): 每個交易寫入的筆數
+            
+        Returns:
+            dict: 新增、略過與無效的數量
+        """
+        inserted = skipped = invalid = 0
+        batch = []
+        
+        for row in rows:
+            if row is None:
+                invalid += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count = self._insert_blacklist_entries(group_id, batch)
+                inserted += count
+                skipped += len(batch) - count
+                batch = []
+        
+        if batch:
+            count = self._insert_blacklist_entries(group_id, batch)
+            inserted += count
+            skipped += len(batch) - count
+        
+        self._log_blacklist_batch(group_id, 'blacklist_imported', {
+            'inserted': inserted,
+            'skipped': skipped,
+            'invalid': invalid
+        })
+        
+        return {'inserted': inserted, 'skipped': skipped, 'invalid': invalid}
+    
+    def _insert_blacklist_entries(self, group_id, entries):
+        # 以 ON CONFLICT DO NOTHING 去除與既有資料重複的項目，批次內的重複則先在記憶體中去除
+        unique_entries = {}
+        for user_id, reason in entries:
+            unique_entries.setdefault(user_id, reason)
+        unique_entries = list(unique_entries.items())
+        blocked_at = datetime.utcnow()
+        
+        inserted = 0
+        for chunk in chunked(unique_entries):
+            result = db.session.connection().execute(insert_ignore(Blacklist.__table__), [
+                {'user_id': user_id, 'group_id': group_id, 'reason': reason, 'blocked_at': blocked_at}
+                for user_id, reason in chunk
+            ])
+            inserted += result.rowcount
+            db.session.commit()
+        return inserted
+    
+    def _log_blacklist_batch(self, group_id, action, details):
+        # 每個批次只寫一筆摘要；全域黑名單沒有對應群組，寫入全域操作日誌。
+        # 群組是否存在由呼叫端檢查，這裡不建立群組
+        logger.info(f"Blacklist batch {action} for {group_id or 'global'}: {details}")
+        if group_id is None:
+            db.session.add(GlobalAuditLog(action=action, details=details))
+        else:
+            db.session.add(AuditLog(group_id=group_id, action=action, details=details))
+        db.session.commit()
+    
     def is_user_blocked(self, group_id, user_id):
         """
         檢查使用者是否被封鎖
@@ -191,6 +305,30 @@ class AntiTakeoverService:
             logger.error(f"Error checking if user is blocked: {e}")
             return False
     
+    def find_blocked_users(self, group_id, user_ids):
+        """
+        以單一查詢找出列表中被封鎖的使用者（群組黑名單與全域黑名單）
+        
+        Args:
+            group_id (str): 群組ID
+            user_ids (list): 使用者ID列表
+            
+        Returns:
+            list: 被封鎖的使用者ID，維持輸入順序
+        """
+        try:
+            blocked = {
+                row.user_id for row in db.session.query(Blacklist.user_id).filter(
+                    Blacklist.user_id.in_(user_ids),
+                    (Blacklist.group_id == group_id) | (Blacklist.group_id.is_(None))
+                )
+            }
+            return [user_id for user_id in dict.fromkeys(user_ids) if user_id in blocked]
+            
+        except Exception as e:
+            logger.error(f"Error checking blocked users: {e}")
+            return []
+    
     def notify_admins(self, group, message):
         """
         通知群組管理員
@@ -198,17 +336,21 @@ class AntiTakeoverService:
         Args:
             group (Group): 群組物件
             message (str): 通知訊息
+            
+        Returns:
+            bool: 是否至少送達一位管理員
         """
+        sent = 0
         try:
             if not self.line_bot_api:
                 logger.warning("LINE Bot API not configured")
-                return
+                return False
             
             admin_ids = group.get_admin_ids()
             
             if not admin_ids:
                 logger.warning(f"No admins configured for group {group.group_id}")
-                return
+                return False
             
             # 發送訊息給每個管理員
             for admin_id in admin_ids:
@@ -217,6 +359,7 @@ class AntiTakeoverService:
                         admin_id,
                         TextSendMessage(text=f"[防翻群警報] {group.group_name or group.group_id}\n\n{message}")
                     )
+                    sent += 1
                     logger.info(f"Notification sent to admin {admin_id}")
                 except LineBotApiError as e:
                     logger.error(f"Failed to send notification to admin {admin_id}: {e}")
@@ -235,6 +378,96 @@ class AntiTakeoverService:
             
         except Exception as e:
             logger.error(f"Error notifying admins: {e}")
+        return sent > 0
+    
+    def ensure_group(self, group_id):
+        """
+        確保群組存在於資料庫（每個群組每個程序只查詢一次）
+        
+        Args:
+            group_id (str): 群組ID
+        """
+        if group_id in _known_group_ids:
+            return
+        
+        if not db.session.get(Group, group_id):
+            db.session.add(Group(group_id=group_id))
+            db.session.commit()
+        _known_group_ids.add(group_id)
+    
+    def record_suspicious_message(self, group_id, user_id, action, details):
+        """
+        記錄可疑訊息
+        
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            action (str): 事件類型
+            details (dict): 詳細資訊
+        """
+        try:
+            self.write_audit_log(group_id, user_id, action, details, is_suspicious=True)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording suspicious message: {e}")
+    
+    def write_audit_log(self, group_id, user_id, action, details=None, is_suspicious=False):
+        """
+        寫入操作日誌；群組在防護模式中時放入緩衝區批次寫入
+        
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            action (str): 事件類型
+            details (dict): 詳細資訊
+            is_suspicious (bool): 是否為可疑事件
+        """
+        if raid_lockdown.is_active(group_id):
+            if raid_lockdown.buffer_audit(group_id, user_id, action, details, is_suspicious):
+                raid_lockdown.flush_audit()
+            return
+        
+        self.ensure_group(group_id)
+        db.session.add(AuditLog(
+            group_id=group_id,
+            user_id=user_id,
+            action=action,
+            details=details,
+            is_suspicious=is_suspicious
+        ))
+        db.session.commit()
+    
+    def record_flood(self, group_id, user_id, text, flood_result):
+        """
+        記錄洗版訊息並標記為可疑
+        
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            text (str): 訊息內容
+            flood_result (dict): FloodDetector 的偵測結果
+        """
+        self.record_suspicious_message(group_id, user_id, 'message_flood', {
+            'reasons': flood_result['reasons'],
+            'duplicate_count': flood_result['duplicate_count'],
+            'repeats': flood_result['repeats'],
+            'text': text[:200]
+        })
+    
+    def record_keyword_match(self, group_id, user_id, text, matches):
+        """
+        記錄命中封鎖關鍵字或惡意連結的訊息
+        
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            text (str): 訊息內容
+            matches (list): KeywordScanner 命中的規則
+        """
+        self.record_suspicious_message(group_id, user_id, 'keyword_match', {
+            'rules': [{'id': m['id'], 'pattern': m['pattern'], 'kind': m['kind']} for m in matches],
+            'text': text[:200]
+        })
     
     def analyze_suspicious_activity(self, group_id, time_window_minutes=5):
         """
@@ -272,16 +505,22 @@ class AntiTakeoverService:
                 if log.is_suspicious:
                     activity_stats['suspicious_events'] += 1
             
-            # 判斷是否異常
+            # 依群組自身基準判斷是否異常
+            anomaly = anomaly_scorer.snapshot(group_id)
+            is_anomalous = bool(anomaly and anomaly['is_anomalous'])  # 活動量顯著高於群組基準
             is_suspicious = (
-                activity_stats['member_join'] > 10 or  # 5分鐘內超過10人加入
                 activity_stats['suspicious_events'] > 0 or  # 有標記為可疑的事件
-                activity_stats['total_events'] > 50  # 5分鐘內超過50個事件
+                is_anomalous
             )
             
+            if is_anomalous or activity_stats['suspicious_events'] >= LOCKDOWN_SUSPICIOUS_EVENTS:
+                raid_lockdown.enter(group_id, 'suspicious_activity')
+            
             return {
                 'is_suspicious': is_suspicious,
                 'stats': activity_stats,
+                'anomaly': anomaly,
+                'lockdown': raid_lockdown.status(group_id),
                 'analysis_time': datetime.utcnow().isoformat()
             }
             
@@ -311,12 +550,10 @@ class AntiTakeoverService:
             member_count = Member.query.filter_by(group_id=group_id).count()
             blacklist_count = Blacklist.query.filter_by(group_id=group_id).count()
             
-            # 最近24小時的活動
-            yesterday = datetime.utcnow() - timedelta(days=1)
-            recent_activity = AuditLog.query.filter(
-                AuditLog.group_id == group_id,
-                AuditLog.timestamp >= yesterday
-            ).count()
+            # 最近24小時與30天的活動（較舊的範圍來自每小時彙總）
+            now = datetime.utcnow()
+            recent_activity = count_activity(now - timedelta(days=1), group_id=group_id)
+            activity_30d = count_activity(now - timedelta(days=30), group_id=group_id)
             
             return {
                 'group_id': group_id,
@@ -326,6 +563,7 @@ class AntiTakeoverService:
                 'blacklist_count': blacklist_count,
                 'threshold': group.threshold,
                 'recent_activity_24h': recent_activity,
+                'activity_30d': activity_30d,
                 'created_at': group.created_at.isoformat() if group.created_at else None
             }
             
@@ -333,3 +571,21 @@ class AntiTakeoverService:
             logger.error(f"Error getting group statistics: {e}")
             return None
 
+
+def load_group_floors(group_id):
+    """
+    載入群組設定的加入門檻（Group.threshold），作為異常評分尚無基準時的判斷依據
+    
+    Args:
+        group_id (str): 群組ID
+        
+    Returns:
+        dict: {'join': 門檻}；群組不存在時回傳 None
+    """
+    group = db.session.get(Group, group_id)
+    if group is None or not group.threshold:
+        return None
+    return {'join': group.threshold}
+
+
+anomaly_scorer.floor_loader = load_group_floors
@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.group import db, AuditLog, AuditLogRollup
+
+logger = logging.getLogger(__name__)
+
+
+def truncate_to_hour(value):
+    """將時間截斷到整點"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def count_activity(since, group_id=None, suspicious_only=False):
+    """
+    計算某時間點之後的事件數量，合併原始日誌與已彙總的每小時統計
+
+    已彙總的原始日誌會被刪除，兩者不會重複計算；彙總資料以整點為單位，
+    只計入起始時間在 since 之後的小時。
+
+    Args:
+        since (datetime): 起始時間（UTC）
+        group_id (str): 群組ID，None 表示所有群組
+        suspicious_only (bool): 只計算可疑事件
+
+    Returns:
+        int: 事件數量
+    """
+    raw_query = db.session.query(func.count(AuditLog.log_id)).filter(AuditLog.timestamp >= since)
+    rollup_column = AuditLogRollup.suspicious_count if suspicious_only else AuditLogRollup.event_count
+    rollup_query = db.session.query(func.coalesce(func.sum(rollup_column), 0)).filter(AuditLogRollup.hour >= since)
+
+    if group_id is not None:
+        raw_query = raw_query.filter(AuditLog.group_id == group_id)
+        rollup_query = rollup_query.filter(AuditLogRollup.group_id == group_id)
+    if suspicious_only:
+        raw_query = raw_query.filter(AuditLog.is_suspicious == True)
+
+    return raw_query.scalar() + int(rollup_query.scalar())
+
+
+class AuditRetentionService:
+    """
+    操作日誌保留期限服務
+
+    將超過保留期限的原始日誌彙總為每群組、每動作、每小時的統計列後刪除。
+    每批只處理少量資料列並立即提交，避免長時間鎖住寫入；
+    刪除時以 RETURNING 取得實際刪除的資料列再彙總，多個程序同時執行也不會重複計算。
+    """
+
+    def __init__(self, retention_days=30, batch_size=500, rollup_retention_days=400):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.rollup_retention_days = rollup_retention_days
+
+    def run(self, now=None, max_batches=None):
+        """
+        彙總並刪除過期的原始日誌
+
+        Args:
+            now (datetime): 目前時間（UTC）
+            max_batches (int): 本次最多處理的批次數，None 表示處理到完為止
+
+        Returns:
+            dict: 本次彙總與刪除的數量
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.retention_days)
+
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self._rollup_batch(cutoff)
+            if not count:
+                break
+            deleted += count
+            batches += 1
+
+        expired_rollups = self._delete_expired_rollups(now - timedelta(days=self.rollup_retention_days))
+
+        if deleted:
+            logger.info(f"Audit retention rolled up {deleted} rows older than {cutoff.isoformat()} in {batches} batches")
+
+        return {
+            'cutoff': cutoff.isoformat(),
+            'rolled_up': deleted,
+            'batches': batches,
+            'expired_rollups': expired_rollups
+        }
+
+    def _rollup_batch(self, cutoff):
+        log_ids = [
+            row.log_id for row in db.session.execute(
+                select(AuditLog.log_id)
+                .where(AuditLog.timestamp < cutoff)
+                .order_by(AuditLog.log_id)
+                .limit(self.batch_size)
+            )
+        ]
+        if not log_ids:
+            return 0
+
+        try:
+            deleted_rows = db.session.connection().execute(
+                delete(AuditLog.__table__)
+                .where(AuditLog.__table__.c.log_id.in_(log_ids))
+                .returning(
+                    AuditLog.__table__.c.group_id,
+                    AuditLog.__table__.c.action,
+                    AuditLog.__table__.c.timestamp,
+                    AuditLog.__table__.c.is_suspicious
+                )
+            ).all()
+
+            buckets = defaultdict(lambda: [0, 0])
+            for row in deleted_rows:
+                bucket = buckets[(row.group_id, row.action, truncate_to_hour(row.timestamp))]
+                bucket[0] += 1
+                if row.is_suspicious:
+                    bucket[1] += 1
+
+            self._merge_rollups(buckets)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # 另一個程序可能已處理同一批資料，仍回傳選取數量以繼續下一批
+        return len(log_ids)
+
+    def _merge_rollups(self, buckets):
+        rows = [
+            {
+                'group_id': group_id,
+                'action': action,
+                'hour': hour,
+                'event_count': counts[0],
+                'suspicious_count': counts[1]
+            }
+            for (group_id, action, hour), counts in buckets.items()
+        ]
+        if not rows:
+            return
+
+        table = AuditLogRollup.__table__
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['group_id', 'action', 'hour'],
+                set_={
+                    'event_count': table.c.event_count + statement.excluded.event_count,
+                    'suspicious_count': table.c.suspicious_count + statement.excluded.suspicious_count
+                }
+            )
+            db.session.connection().execute(statement, rows)
+            return
+
+        for row in rows:
+            rollup = AuditLogRollup.query.filter_by(
+                group_id=row['group_id'], action=row['action'], hour=row['hour']
+            ).first()
+            if rollup:
+                rollup.event_count += row['event_count']
+                rollup.suspicious_count += row['suspicious_count']
+            else:
+                db.session.add(AuditLogRollup(**row))
+
+    def _delete_expired_rollups(self, before):
+        result = db.session.connection().execute(
+            delete(AuditLogRollup.__table__).where(AuditLogRollup.__table__.c.hour < before)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def maintain(self, vacuum=False):
+        """
+        更新查詢規劃統計（ANALYZE），必要時回收空間（VACUUM）
+
+        Args:
+            vacuum (bool): 是否執行 VACUUM；SQLite 的 VACUUM 會重寫整個資料庫，應低頻率執行
+        """
+        dialect = db.engine.dialect.name
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            if dialect == 'postgresql':
+                tables = ', '.join([AuditLog.__tablename__, AuditLogRollup.__tablename__])
+                connection.execute(text(f"VACUUM ANALYZE {tables}" if vacuum else f"ANALYZE {tables}"))
+            elif dialect == 'sqlite':
+                if vacuum:
+                    connection.execute(text("VACUUM"))
+                connection.execute(text("ANALYZE"))
+        logger.info(f"Database maintenance finished (vacuum={vacuum})")
+
+
+def start_audit_retention(app, interval_seconds, retention_days, analyze_every=86400, vacuum_every=604800):
+    """
+    啟動背景執行緒，定期執行日誌彙總與資料庫維護
+
+    Args:
+        app (Flask): Flask app，用於建立 app context
+        interval_seconds (int): 彙總間隔（秒）
+        retention_days (int): 原始日誌保留天數
+        analyze_every (int): ANALYZE 間隔（秒）
+        vacuum_every (int): VACUUM 間隔（秒）
+
+    Returns:
+        threading.Event: 設定後即停止
+    """
+    stop_event = threading.Event()
+    service = AuditRetentionService(retention_days=retention_days)
+
+    def run():
+        last_analyze = last_vacuum = time.time()
+        while not stop_event.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    service.run()
+
+                    now = time.time()
+                    vacuum = now - last_vacuum >= vacuum_every
+                    if vacuum or now - last_analyze >= analyze_every:
+                        service.maintain(vacuum=vacuum)
+                        last_analyze = now
+                        if vacuum:
+                            last_vacuum = now
+                except Exception as e:
+                    logger.error(f"Audit retention failed: {e}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='audit-retention', daemon=True)
+    thread.start()
+    return stop_event
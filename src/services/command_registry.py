@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.models.group import Group
+
+logger = logging.getLogger(__name__)
+
+PERMISSION_MEMBER = 'member'
+PERMISSION_ADMIN = 'admin'
+
+
+class TokenBucketLimiter:
+    """
+    以鍵值區分的 token bucket 限流器，狀態數量有上限（LRU 淘汰）
+    """
+
+    def __init__(self, capacity, refill_per_second, max_keys=50000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1.0, now=None):
+        """
+        嘗試扣除 token
+
+        Args:
+            key: 限流鍵（例如 (group_id, user_id)）
+            cost (float): 扣除的 token 數
+            now (float): 目前時間（秒）
+
+        Returns:
+            bool: 是否允許
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(self.capacity)
+                while len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+                self._buckets.move_to_end(key)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            return allowed
+
+
+class Command:
+    """已註冊的指令"""
+
+    __slots__ = ('name', 'handler', 'permission', 'min_args', 'max_args', 'usage', 'cost')
+
+    def __init__(self, name, handler, permission, min_args, max_args, usage, cost):
+        self.name = name
+        self.handler = handler
+        self.permission = permission
+        self.min_args = min_args
+        self.max_args = max_args
+        self.usage = usage
+        self.cost = cost
+
+
+class CommandContext:
+    """指令執行時的參數"""
+
+    __slots__ = ('group_id', 'user_id', 'args', 'event')
+
+    def __init__(self, group_id, user_id, args, event):
+        self.group_id = group_id
+        self.user_id = user_id
+        self.args = args
+        self.event = event
+
+
+class CommandRegistry:
+    """
+    宣告式指令註冊表
+
+    指令以 dict 查表分派，參數只解析一次；未知指令、權限不足或超過頻率限制的指令
+    會直接丟棄，不呼叫任何 LINE API。群組管理員名單在記憶體中快取，
+    只有通過個人頻率限制的指令才可能查詢資料庫。
+    管理員不受群組頻率限制，突襲帳號洗指令用完群組額度時，管理員的指令仍會回應。
+    """
+
+    def __init__(self, superuser_ids=None, user_limiter=None, group_limiter=None, admin_cache_ttl=60.0):
+        self.superuser_ids = set(superuser_ids or [])
+        self.user_limiter = user_limiter or TokenBucketLimiter(capacity=3, refill_per_second=0.2)
+        self.group_limiter = group_limiter or TokenBucketLimiter(capacity=10, refill_per_second=0.5)
+        self.admin_cache_ttl = admin_cache_ttl
+        self._commands = {}
+        self._admin_cache = {}
+
+    def command(self, name, permission=PERMISSION_MEMBER, min_args=0, max_args=0, usage=None, cost=1.0):
+        """
+        以裝飾器註冊指令
+
+        Args:
+            name (str): 指令名稱（含 /）
+            permission (str): member 或 admin
+            min_args (int): 最少參數數量
+            max_args (int): 最多參數數量
+            usage (str): 參數錯誤時回覆的用法說明
+            cost (float): 每次執行扣除的 token 數
+        """
+        def decorator(handler):
+            self._commands[name.lower()] = Command(
+                name.lower(), handler, permission, min_args, max_args, usage, cost
+            )
+            return handler
+        return decorator
+
+    def commands(self):
+        """取得所有已註冊的指令"""
+        return list(self._commands.values())
+
+    @staticmethod
+    def parse(text):
+        """
+        解析指令文字
+
+        Args:
+            text (str): 訊息內容
+
+        Returns:
+            tuple: (指令名稱, 參數列表)；非指令時回傳 (None, [])
+        """
+        if not text.startswith('/'):
+            return None, []
+        parts = text.split()
+        return parts[0].lower(), parts[1:]
+
+    def dispatch(self, group_id, user_id, text, event=None):
+        """
+        分派指令
+
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            text (str): 訊息內容
+            event: LINE 事件
+
+        Returns:
+            str: 要回覆的文字；不需回覆時回傳 None
+        """
+        name, args = self.parse(text)
+        command = self._commands.get(name) if name else None
+        if command is None:
+            return None
+
+        if not self.user_limiter.allow((group_id, user_id), command.cost):
+            logger.info(f"Command {name} from {user_id} in {group_id} dropped: user rate limit")
+            return None
+
+        # 先檢查權限：不會回覆的指令不扣群組額度，管理員也不佔用群組額度
+        is_admin = self.is_admin(group_id, user_id)
+        if command.permission == PERMISSION_ADMIN and not is_admin:
+            logger.info(f"Command {name} from {user_id} in {group_id} dropped: not an admin")
+            return None
+        if not is_admin and not self.group_limiter.allow(group_id, command.cost):
+            logger.info(f"Command {name} in {group_id} dropped: group rate limit")
+            return None
+
+        if not command.min_args <= len(args) <= command.max_args:
+            return command.usage
+
+        return command.handler(CommandContext(group_id, user_id, args, event))
+
+    def is_admin(self, group_id, user_id):
+        """
+        檢查使用者是否為群組管理員（含全域管理員），管理員名單快取於記憶體
+
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+
+        Returns:
+            bool: 是否為管理員
+        """
+        if user_id in self.superuser_ids:
+            return True
+
+        now = time.time()
+        cached = self._admin_cache.get(group_id)
+        if cached is None or now - cached[1] > self.admin_cache_ttl:
+            try:
+                group = Group.query.filter_by(group_id=group_id).first()
+                admin_ids = frozenset(group.get_admin_ids()) if group else frozenset()
+            except Exception as e:
+                logger.error(f"Error loading admins for group {group_id}: {e}")
+                admin_ids = frozenset()
+            cached = (admin_ids, now)
+            self._admin_cache[group_id] = cached
+
+        return user_id in cached[0]
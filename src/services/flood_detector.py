@@ -0,0 +1,263 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from itertools import combinations
+
+_URL_PATTERN = re.compile(r'https?://|www\.|line\.me/', re.IGNORECASE)
+_STRIP_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+_DIGITS_PATTERN = re.compile(r'\d+')
+
+# 正規化後達到此長度的訊息才將數字統一，短訊息（例如 +1、+2）保留原本的數字
+_DIGIT_FOLD_MIN_LENGTH = 8
+
+# MinHash 參數：以字元 3-gram 為單位，8 個雜湊分成 4 個 band，
+# 相似訊息需在任兩個 band 同時相同才共用指紋鍵，只有單一 band 碰撞的一般聊天不算重複
+_SHINGLE_SIZE = 3
+_MINHASH_PERMUTATIONS = 8
+_MINHASH_BAND_SIZE = 2
+_MINHASH_BAND_AGREEMENT = 2
+_MERSENNE_PRIME = (1 << 61) - 1
+_MINHASH_COEFFICIENTS = [
+    (
+        int.from_bytes(hashlib.blake2b(f'a{i}'.encode(), digest_size=8).digest(), 'big') % _MERSENNE_PRIME | 1,
+        int.from_bytes(hashlib.blake2b(f'b{i}'.encode(), digest_size=8).digest(), 'big') % _MERSENNE_PRIME
+    )
+    for i in range(_MINHASH_PERMUTATIONS)
+]
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def normalize_text(text):
+    """
+    正規化訊息內容：全形轉半形、轉小寫、移除空白與標點，較長的訊息再將數字統一，
+    讓只改動標點或數字的洗版訊息得到相同的指紋
+    """
+    text = _STRIP_PATTERN.sub('', unicodedata.normalize('NFKC', text).lower())
+    if len(text) >= _DIGIT_FOLD_MIN_LENGTH:
+        text = _DIGITS_PATTERN.sub('0', text)
+    return text
+
+
+def fingerprint_keys(normalized):
+    """
+    計算訊息的指紋鍵：完整內容雜湊加上 MinHash band 組合，
+    相似但不完全相同的訊息會共用部分 band 組合
+
+    Args:
+        normalized (str): 正規化後的訊息
+
+    Returns:
+        list: 64 位元整數鍵
+    """
+    keys = [_hash64(normalized)]
+
+    if len(normalized) <= _SHINGLE_SIZE:
+        return keys
+
+    shingles = {
+        _hash64(normalized[i:i + _SHINGLE_SIZE])
+        for i in range(len(normalized) - _SHINGLE_SIZE + 1)
+    }
+    signature = [
+        min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles)
+        for a, b in _MINHASH_COEFFICIENTS
+    ]
+    bands = []
+    for band in range(0, _MINHASH_PERMUTATIONS, _MINHASH_BAND_SIZE):
+        band_value = ':'.join(str(value) for value in signature[band:band + _MINHASH_BAND_SIZE])
+        bands.append(f'{band}:{band_value}')
+    for combination in combinations(bands, _MINHASH_BAND_AGREEMENT):
+        keys.append(_hash64('|'.join(combination)))
+
+    return keys
+
+
+class SlidingCountMinSketch:
+    """
+    以兩個輪替的 count-min sketch 近似滑動時間窗口內的計數，記憶體大小固定；
+    每則訊息約佔 7 個鍵，寬度需足以容納繁忙群組一個窗口內的訊息，否則碰撞會高估計數
+    """
+
+    __slots__ = ('width', 'depth', 'slice_seconds', 'slices', 'slice_started')
+
+    def __init__(self, window_seconds, width=1024, depth=4, now=None):
+        self.width = width
+        self.depth = depth
+        self.slice_seconds = window_seconds
+        self.slices = [array('I', bytes(4 * width * depth)), array('I', bytes(4 * width * depth))]
+        self.slice_started = time.time() if now is None else now
+
+    def _rotate(self, now):
+        elapsed = now - self.slice_started
+        if elapsed < self.slice_seconds:
+            return
+        if elapsed >= 2 * self.slice_seconds:
+            # 閒置超過兩個窗口，所有計數皆已過期
+            self.slices[1] = array('I', bytes(4 * self.width * self.depth))
+        else:
+            self.slices[1] = self.slices[0]
+        self.slices[0] = array('I', bytes(4 * self.width * self.depth))
+        self.slice_started = now
+
+    def _positions(self, key):
+        for row in range(self.depth):
+            # 每一列使用 64 位元雜湊中不同的 16 位元片段
+            yield row * self.width + ((key >> (row * 16)) & 0xFFFF) % self.width
+
+    def add(self, key, now):
+        """加入一筆計數並回傳目前窗口內的估計值"""
+        self._rotate(now)
+        current, previous = self.slices
+        estimate = None
+        for position in self._positions(key):
+            if current[position] < 0xFFFFFFFF:
+                current[position] += 1
+            total = current[position] + previous[position]
+            estimate = total if estimate is None else min(estimate, total)
+        return estimate
+
+    def estimate(self, key, now):
+        """估計目前窗口內的計數"""
+        self._rotate(now)
+        current, previous = self.slices
+        return min(current[position] + previous[position] for position in self._positions(key))
+
+
+class _UserState:
+    """單一使用者的 token bucket 與最近一則訊息指紋"""
+
+    __slots__ = ('tokens', 'updated_at', 'last_fingerprint', 'repeats')
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.updated_at = now
+        self.last_fingerprint = None
+        self.repeats = 0
+
+
+class FloodDetector:
+    """
+    訊息洗版與重複垃圾訊息偵測器
+
+    - 每位使用者一個 token bucket，限制發言速率
+    - 同一使用者在 duplicate_window 內連續發送相同內容時累計重複次數（指令由指令頻率限制處理，不計入）
+    - 每個群組一個滑動窗口 count-min sketch，估計多少帳號發送了相同或相似的內容
+
+    所有狀態皆在記憶體中且有上限，不需要每則訊息讀取資料庫。
+    """
+
+    def __init__(self, bucket_capacity=8, refill_per_second=0.5, repeat_limit=3,
+                 duplicate_limit=4, duplicate_window=60.0, min_duplicate_length=8,
+                 max_users=50000, max_groups=2000):
+        self.bucket_capacity = bucket_capacity
+        self.refill_per_second = refill_per_second
+        self.repeat_limit = repeat_limit
+        self.duplicate_limit = duplicate_limit
+        self.duplicate_window = duplicate_window
+        self.min_duplicate_length = min_duplicate_length
+        self.max_users = max_users
+        self.max_groups = max_groups
+        self._users = OrderedDict()
+        self._sketches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inspect(self, group_id, user_id, text, now=None):
+        """
+        檢查一則訊息是否為洗版
+
+        Args:
+            group_id (str): 群組ID
+            user_id (str): 使用者ID
+            text (str): 訊息內容
+            now (float): 訊息時間（秒），預設為目前時間
+
+        Returns:
+            dict: 偵測結果，包含是否洗版與原因
+        """
+        now = time.time() if now is None else now
+        normalized = normalize_text(text)
+        check_duplicates = (
+            len(normalized) >= self.min_duplicate_length or
+            bool(_URL_PATTERN.search(text))
+        )
+        keys = fingerprint_keys(normalized) if normalized else []
+
+        reasons = []
+        with self._lock:
+            user = self._get_user(group_id, user_id, now)
+
+            # 距離上一則訊息超過窗口時，重複次數重新計算
+            if now - user.updated_at > self.duplicate_window:
+                user.last_fingerprint = None
+                user.repeats = 0
+
+            # token bucket 補充並扣除
+            user.tokens = min(
+                self.bucket_capacity,
+                user.tokens + (now - user.updated_at) * self.refill_per_second
+            )
+            user.updated_at = now
+            if user.tokens >= 1.0:
+                user.tokens -= 1.0
+            else:
+                reasons.append('rate')
+
+            fingerprint = keys[0] if keys else None
+            is_repeat = fingerprint is not None and fingerprint == user.last_fingerprint
+            user.repeats = user.repeats + 1 if is_repeat else 1
+            user.last_fingerprint = fingerprint
+            # 重複的指令由指令頻率限制處理，不視為洗版
+            if fingerprint is not None and not text.startswith('/') and user.repeats >= self.repeat_limit:
+                reasons.append('repeat')
+
+            duplicate_count = 0
+            if check_duplicates and keys:
+                sketch = self._get_sketch(group_id, now)
+                if is_repeat:
+                    # 同一帳號重複發送只計一次，讓計數代表不同帳號的數量
+                    duplicate_count = max(sketch.estimate(key, now) for key in keys)
+                else:
+                    duplicate_count = max(sketch.add(key, now) for key in keys)
+                if duplicate_count >= self.duplicate_limit:
+                    reasons.append('duplicate')
+
+            return {
+                'is_flood': bool(reasons),
+                'reasons': reasons,
+                'duplicate_count': duplicate_count,
+                'repeats': user.repeats,
+                'tokens': round(user.tokens, 2)
+            }
+
+    def _get_user(self, group_id, user_id, now):
+        key = (group_id, user_id)
+        user = self._users.get(key)
+        if user is None:
+            user = _UserState(self.bucket_capacity, now)
+            self._users[key] = user
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        return user
+
+    def _get_sketch(self, group_id, now):
+        sketch = self._sketches.get(group_id)
+        if sketch is None:
+            sketch = SlidingCountMinSketch(self.duplicate_window, now=now)
+            self._sketches[group_id] = sketch
+            while len(self._sketches) > self.max_groups:
+                self._sketches.popitem(last=False)
+        else:
+            self._sketches.move_to_end(group_id)
+        return sketch
+
+
+flood_detector = FloodDetector()
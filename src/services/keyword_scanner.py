@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+import unicodedata
+from collections import deque
+from src.models.group import db, KeywordRule
+
+logger = logging.getLogger(__name__)
+
+# 網域比對時，前後不能緊接主機名稱的字元，避免 example.com 誤中 notexample.com 或 example.com.evil；
+# 其他字元（空白、標點、中文等）都視為邊界，網址常直接接在中文之後
+_HOSTNAME_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789-')
+
+
+def normalize_pattern(text):
+    """關鍵字與訊息使用相同的正規化：全形轉半形並轉小寫"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多字串比對自動機
+
+    建置後對一段文字只需掃描一次即可找出所有命中的字串，
+    每個字元的成本與規則數量無關。
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (list): (pattern, payload) 列表，pattern 需已正規化
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [()]
+        self._out_link = [-1]
+        self.size = 0
+
+        for pattern, payload in entries:
+            if pattern:
+                self._insert(pattern, payload)
+        self._build_links()
+
+    def _insert(self, pattern, payload):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+                self._out_link.append(-1)
+            state = next_state
+        self._outputs[state] = self._outputs[state] + ((len(pattern), payload),)
+        self.size += 1
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                fail_state = self._fail[next_state]
+                self._out_link[next_state] = fail_state if self._outputs[fail_state] else self._out_link[fail_state]
+
+    def scan(self, text):
+        """
+        掃描文字
+
+        Args:
+            text (str): 已正規化的文字
+
+        Returns:
+            list: (結束位置, pattern 長度, payload) 列表
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        out_link = self._out_link
+
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            match_state = state if outputs[state] else out_link[state]
+            while match_state > 0:
+                for length, payload in outputs[match_state]:
+                    matches.append((index, length, payload))
+                match_state = out_link[match_state]
+        return matches
+
+
+class KeywordScanner:
+    """
+    群組訊息的關鍵字與惡意連結掃描器
+
+    所有群組與全域的規則編譯成同一個自動機，payload 記錄規則所屬群組，
+    掃描時只保留全域規則與該群組的規則。管理員新增規則時先放入小型增量自動機，
+    累積到一定數量才合併重建；刪除則以墓碑標記，不需要立即重建。
+    """
+
+    def __init__(self, refresh_interval=30.0, merge_ratio=0.05, min_merge_size=64):
+        self.refresh_interval = refresh_interval
+        self.merge_ratio = merge_ratio
+        self.min_merge_size = min_merge_size
+        self._rules = {}
+        self._main = AhoCorasick([])
+        self._delta = AhoCorasick([])
+        self._delta_ids = set()
+        self._removed_ids = set()
+        self._loaded = False
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self):
+        """
+        首次使用時自資料庫載入規則，之後定期檢查其他程序是否修改過規則
+        """
+        now = time.time()
+        if self._loaded and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if self._loaded and now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+
+            fingerprint = tuple(db.session.query(
+                db.func.count(KeywordRule.id), db.func.max(KeywordRule.id)
+            ).one())
+            if self._loaded and fingerprint == self._fingerprint:
+                return
+
+            rules = KeywordRule.query.all()
+            self._rules = {rule.id: self._rule_payload(rule) for rule in rules}
+            self._rebuild()
+            self._fingerprint = fingerprint
+            self._loaded = True
+            logger.info(f"Keyword scanner loaded {len(self._rules)} rules")
+
+    def add_rules(self, rules):
+        """
+        新增規則（管理員編輯後呼叫），只重建增量自動機
+
+        Args:
+            rules (list): KeywordRule 物件列表
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            for rule in rules:
+                self._rules[rule.id] = self._rule_payload(rule)
+                self._removed_ids.discard(rule.id)
+                self._delta_ids.add(rule.id)
+            self._fingerprint = self._local_fingerprint()
+
+            if len(self._delta_ids) > max(self.min_merge_size, self._main.size * self.merge_ratio):
+                self._rebuild()
+            else:
+                self._delta = AhoCorasick(
+                    (self._rules[rule_id]['pattern'], self._rules[rule_id]) for rule_id in self._delta_ids
+                )
+
+    def remove_rules(self, rule_ids):
+        """
+        移除規則，以墓碑標記避免重建整個自動機
+
+        Args:
+            rule_ids (list): 規則ID列表
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            for rule_id in rule_ids:
+                if self._rules.pop(rule_id, None) is not None:
+                    self._removed_ids.add(rule_id)
+            self._fingerprint = self._local_fingerprint()
+
+            if len(self._removed_ids) > max(self.min_merge_size, self._main.size * self.merge_ratio):
+                self._rebuild()
+
+    def scan(self, group_id, text):
+        """
+        掃描訊息
+
+        Args:
+            group_id (str): 群組ID
+            text (str): 訊息內容
+
+        Returns:
+            list: 命中的規則（去除重複）
+        """
+        normalized = normalize_pattern(text)
+        main, delta, removed = self._main, self._delta, self._removed_ids
+
+        hits = {}
+        for automaton in (main, delta):
+            if not automaton.size:
+                continue
+            for end, length, payload in automaton.scan(normalized):
+                rule_id = payload['id']
+                if rule_id in hits or rule_id in removed:
+                    continue
+                if payload['group_id'] is not None and payload['group_id'] != group_id:
+                    continue
+                if payload['kind'] == 'domain' and not self._is_domain_match(normalized, end, length):
+                    continue
+                hits[rule_id] = {
+                    'id': rule_id,
+                    'pattern': payload['pattern'],
+                    'kind': payload['kind'],
+                    'group_id': payload['group_id']
+                }
+        return list(hits.values())
+
+    def _local_fingerprint(self):
+        # 與 ensure_loaded 查詢的 (count, max id) 相同，本程序的修改不會觸發整體重新載入
+        return (len(self._rules), max(self._rules) if self._rules else None)
+
+    def _rebuild(self):
+        self._main = AhoCorasick((payload['pattern'], payload) for payload in self._rules.values())
+        self._delta = AhoCorasick([])
+        self._delta_ids = set()
+        self._removed_ids = set()
+
+    @staticmethod
+    def _rule_payload(rule):
+        return {
+            'id': rule.id,
+            'group_id': rule.group_id,
+            'pattern': normalize_pattern(rule.pattern),
+            'kind': rule.kind
+        }
+
+    @staticmethod
+    def _is_domain_match(text, end, length):
+        start = end - length + 1
+        if start > 0 and text[start - 1] in _HOSTNAME_CHARS:
+            return False
+        following = text[end + 1:end + 3]
+        if following[:1] in _HOSTNAME_CHARS:
+            return False
+        # 右側的「.」後面若還接著主機名稱字元，表示是更長的網域（句尾的句點不算）
+        return not (following[:1] == '.' and following[1:] in _HOSTNAME_CHARS)
+
+
+keyword_scanner = KeywordScanner()
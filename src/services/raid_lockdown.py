@@ -0,0 +1,323 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from linebot import WebhookParser
+from linebot.models import MemberJoinedEvent, MemberLeftEvent
+from src.models.group import db, Group, AuditLog
+from src.utils.bulk import insert_ignore, chunked
+
+logger = logging.getLogger(__name__)
+
+# 合併通知中各類事件的顯示名稱
+ALERT_LABELS = OrderedDict([
+    ('join', '加入'),
+    ('leave', '離開'),
+    ('kick', '黑名單成員加入'),
+    ('flood', '洗版'),
+    ('keyword', '封鎖關鍵字'),
+    ('command', '略過的指令'),
+])
+
+# 防護模式中優先處理的事件類型
+PROTECTIVE_EVENT_TYPES = (MemberJoinedEvent, MemberLeftEvent)
+
+
+class _LockdownState:
+    __slots__ = ('group_id', 'reason', 'entered_at', 'until', 'triggers')
+
+    def __init__(self, group_id, reason, now, until):
+        self.group_id = group_id
+        self.reason = reason
+        self.entered_at = now
+        self.until = until
+        self.triggers = 1
+
+    def to_dict(self, now):
+        return {
+            'group_id': self.group_id,
+            'reason': self.reason,
+            'entered_at': datetime.utcfromtimestamp(self.entered_at).isoformat(),
+            'expires_at': datetime.utcfromtimestamp(self.until).isoformat(),
+            'remaining_seconds': max(round(self.until - now, 1), 0.0),
+            'triggers': self.triggers
+        }
+
+
+class _AlertDigest:
+    __slots__ = ('counts', 'samples')
+
+    def __init__(self):
+        self.counts = {}
+        self.samples = {}
+
+
+class RaidLockdown:
+    """
+    群組防護模式（翻群突襲時的降載）
+
+    群組被判定為遭受突襲時進入防護模式，冷卻時間內若再次觸發則延長：
+    - 略過非必要工作：不回覆指令、不寫每個事件的文字日誌
+    - 操作日誌先放入緩衝區，由背景執行緒批次寫入
+    - 管理員通知合併為每個群組每個週期一則摘要
+    - 同一批 webhook 事件中優先處理成員加入 / 離開等防護動作
+
+    狀態只存在各程序的記憶體中，與其他偵測器相同；
+    gunicorn 預設只用一個 worker（見 gunicorn.conf.py），所有事件與管理操作都看到同一份狀態。
+    """
+
+    def __init__(self, cooldown_seconds=300.0, max_buffered_audit=500, max_alert_samples=10):
+        self.cooldown_seconds = cooldown_seconds
+        self.max_buffered_audit = max_buffered_audit
+        self.max_alert_samples = max_alert_samples
+        self._groups = {}
+        self._audit_buffer = []
+        self._alerts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enter(self, group_id, reason, now=None):
+        """
+        讓群組進入防護模式；已在防護模式中則延長冷卻時間
+
+        Args:
+            group_id (str): 群組ID
+            reason (str): 觸發原因
+            now (float): 目前時間（秒）
+
+        Returns:
+            bool: 是否為新進入防護模式
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._groups.get(group_id)
+            if state is not None and now < state.until:
+                state.until = now + self.cooldown_seconds
+                state.triggers += 1
+                return False
+            self._groups[group_id] = _LockdownState(group_id, reason, now, now + self.cooldown_seconds)
+        logger.warning(f"Group {group_id} entered lockdown ({reason})")
+        return True
+
+    def exit(self, group_id):
+        """
+        立即解除群組的防護模式
+
+        Returns:
+            bool: 群組原本是否在防護模式中
+        """
+        with self._lock:
+            state = self._groups.get(group_id)
+            if state is None:
+                return False
+            # 交由下一次 flush 送出解除摘要並移除狀態
+            state.until = 0.0
+        return True
+
+    def is_active(self, group_id, now=None):
+        """檢查群組是否在防護模式中"""
+        state = self._groups.get(group_id)
+        if state is None:
+            return False
+        return (time.time() if now is None else now) < state.until
+
+    def any_active(self, group_ids, now=None):
+        """檢查任一群組是否在防護模式中"""
+        if not self._groups:
+            return False
+        now = time.time() if now is None else now
+        return any(self.is_active(group_id, now) for group_id in group_ids)
+
+    def status(self, group_id, now=None):
+        """
+        取得群組的防護模式狀態
+
+        Returns:
+            dict: 狀態；不在防護模式中時回傳 None
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._groups.get(group_id)
+            if state is None or now >= state.until:
+                return None
+            return state.to_dict(now)
+
+    def active_groups(self, now=None):
+        """取得所有在防護模式中的群組狀態"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [state.to_dict(now) for state in self._groups.values() if now < state.until]
+
+    def buffer_audit(self, group_id, user_id, action, details=None, is_suspicious=False):
+        """
+        將操作日誌放入緩衝區
+
+        Returns:
+            bool: 緩衝區已滿，呼叫端應立即 flush_audit()
+        """
+        row = {
+            'group_id': group_id,
+            'user_id': user_id,
+            'action': action,
+            'details': json.dumps(details) if details else None,
+            'is_suspicious': is_suspicious,
+            'timestamp': datetime.utcnow()
+        }
+        with self._lock:
+            self._audit_buffer.append(row)
+            return len(self._audit_buffer) >= self.max_buffered_audit
+
+    def add_alert(self, group_id, kind, user_ids=None, count=None):
+        """
+        累計一筆待合併的通知
+
+        Args:
+            group_id (str): 群組ID
+            kind (str): 事件類型，見 ALERT_LABELS
+            user_ids (list): 相關使用者ID，只保留前幾筆作為範例
+            count (int): 事件數量，預設為 user_ids 的數量或 1
+        """
+        user_ids = user_ids or []
+        count = count if count is not None else (len(user_ids) or 1)
+        with self._lock:
+            digest = self._alerts.get(group_id)
+            if digest is None:
+                digest = self._alerts[group_id] = _AlertDigest()
+            digest.counts[kind] = digest.counts.get(kind, 0) + count
+            samples = digest.samples.setdefault(kind, [])
+            for user_id in user_ids[:self.max_alert_samples - len(samples)]:
+                samples.append(user_id)
+
+    def flush_audit(self):
+        """
+        批次寫入緩衝區中的操作日誌（需在 app context 中呼叫）
+
+        Returns:
+            int: 寫入的筆數
+        """
+        with self._lock:
+            rows, self._audit_buffer = self._audit_buffer, []
+        if not rows:
+            return 0
+
+        try:
+            # 操作日誌的群組外鍵需要群組已存在
+            group_ids = sorted({row['group_id'] for row in rows})
+            db.session.execute(insert_ignore(Group), [{'group_id': group_id} for group_id in group_ids])
+            for chunk in chunked(rows):
+                db.session.connection().execute(AuditLog.__table__.insert(), chunk)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not write {len(rows)} buffered audit logs: {e}")
+            return 0
+        return len(rows)
+
+    def drain_alerts(self, now=None):
+        """
+        取出合併後的通知，並解除冷卻時間已過的群組
+
+        Returns:
+            list: (群組ID, 通知文字)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            alerts, self._alerts = self._alerts, OrderedDict()
+            expired = [state for state in self._groups.values() if now >= state.until]
+            for state in expired:
+                del self._groups[state.group_id]
+
+        messages = []
+        expired_ids = {state.group_id for state in expired}
+        for group_id, digest in alerts.items():
+            status = '防護模式已解除' if group_id in expired_ids else '防護模式中'
+            messages.append((group_id, f"🛡️ 群組 {group_id} {status}\n{self._format_digest(digest)}"))
+        for state in expired:
+            logger.info(f"Group {state.group_id} left lockdown after {now - state.entered_at:.0f}s")
+            if state.group_id not in alerts:
+                messages.append((state.group_id, f"🛡️ 群組 {state.group_id} 防護模式已解除"))
+        return messages
+
+    def _format_digest(self, digest):
+        lines = []
+        for kind, label in ALERT_LABELS.items():
+            count = digest.counts.get(kind)
+            if not count:
+                continue
+            line = f"{label}：{count}"
+            samples = digest.samples.get(kind)
+            if samples:
+                more = '…' if count > len(samples) else ''
+                line += "\n  " + "\n  ".join(samples) + more
+            lines.append(line)
+        return "\n".join(lines)
+
+    def flush(self, notifier, now=None):
+        """
+        寫入緩衝的操作日誌並送出合併通知（需在 app context 中呼叫）
+
+        Args:
+            notifier (callable): 接收通知文字的函式
+        """
+        written = self.flush_audit()
+        messages = self.drain_alerts(now)
+        for _, text in messages:
+            try:
+                notifier(text)
+            except Exception as e:
+                logger.error(f"Could not send lockdown alert: {e}")
+        return {'audit_written': written, 'alerts_sent': len(messages)}
+
+
+class PriorityWebhookParser(WebhookParser):
+    """
+    webhook 解析器：同一批事件中若有群組在防護模式，
+    成員加入 / 離開等防護事件會排在一般訊息之前處理（同類事件維持原順序）
+    """
+
+    def __init__(self, channel_secret, lockdown):
+        super().__init__(channel_secret)
+        self.lockdown = lockdown
+
+    def parse(self, body, signature, as_payload=False, **kwargs):
+        result = super().parse(body, signature, as_payload=as_payload, **kwargs)
+        events = result.events if as_payload else result
+        group_ids = {getattr(event.source, 'group_id', None) for event in events}
+        if len(events) > 1 and self.lockdown.any_active(group_ids):
+            events.sort(key=lambda event: 0 if isinstance(event, PROTECTIVE_EVENT_TYPES) else 1)
+        return result
+
+
+def start_raid_lockdown_flusher(app, notifier, interval_seconds=5.0, lockdown=None):
+    """
+    啟動背景執行緒，定期寫入緩衝的操作日誌、送出合併通知並解除到期的防護模式
+
+    Args:
+        app (Flask): Flask app，用於建立 app context
+        notifier (callable): 接收通知文字的函式
+        interval_seconds (float): 執行間隔（秒）
+        lockdown (RaidLockdown): 預設為模組層級的 raid_lockdown
+
+    Returns:
+        threading.Event: 設定後即停止
+    """
+    lockdown = lockdown or raid_lockdown
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    lockdown.flush(notifier)
+                except Exception as e:
+                    logger.error(f"Raid lockdown flush failed: {e}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='raid-lockdown', daemon=True)
+    thread.start()
+    return stop_event
+
+
+raid_lockdown = RaidLockdown()
@@ -0,0 +1,259 @@
+import logging
+import threading
+from datetime import datetime
+from linebot.exceptions import LineBotApiError
+from sqlalchemy import delete, update, bindparam
+from src.models.group import db, Group, Member, AuditLog
+from src.services.anti_takeover import AntiTakeoverService
+from src.utils.bulk import insert_ignore, chunked
+
+logger = logging.getLogger(__name__)
+
+# 管理介面觸發的單一群組同步，依群組ID記錄最近一次的狀態
+_sync_jobs = {}
+_sync_jobs_lock = threading.Lock()
+
+
+class RosterSyncService:
+    """
+    群組成員名單同步服務
+
+    透過 LINE 的群組成員ID API 分頁取得完整名單，在記憶體中與資料庫比對，
+    只對新增與移除的成員執行批次 insert / delete，每個區塊一個交易。
+    """
+
+    def __init__(self, line_bot_api):
+        self.line_bot_api = line_bot_api
+
+    def fetch_member_ids(self, group_id):
+        """
+        分頁取得群組所有成員ID
+
+        Args:
+            group_id (str): 群組ID
+
+        Returns:
+            set: 成員ID集合；API 不可用時回傳 None
+        """
+        member_ids = set()
+        start = None
+        try:
+            while True:
+                page = self.line_bot_api.get_group_member_ids(group_id, start=start)
+                member_ids.update(page.member_ids)
+                start = getattr(page, 'next', None)
+                if not start:
+                    return member_ids
+        except LineBotApiError as e:
+            # 成員ID API 僅限認證帳號或進階帳號使用
+            logger.error(f"LINE Bot API error when fetching members of {group_id}: {e}")
+            return None
+
+    def sync_group(self, group_id, full=False):
+        """
+        同步單一群組的成員名單
+
+        Args:
+            group_id (str): 群組ID
+            full (bool): 完整模式會重新取得所有成員的顯示名稱；
+                         增量模式只取得新成員的顯示名稱
+
+        Returns:
+            dict: 同步結果；無法取得名單時回傳 None
+        """
+        remote_ids = self.fetch_member_ids(group_id)
+        if remote_ids is None:
+            return None
+
+        AntiTakeoverService(self.line_bot_api).ensure_group(group_id)
+
+        local_ids = {
+            row.user_id for row in
+            db.session.query(Member.user_id).filter(Member.group_id == group_id)
+        }
+        added = sorted(remote_ids - local_ids)
+        removed = sorted(local_ids - remote_ids)
+
+        display_names = self._fetch_display_names(group_id, sorted(remote_ids) if full else added)
+
+        for chunk in chunked(added):
+            db.session.execute(insert_ignore(Member), [
+                {
+                    'user_id': user_id,
+                    'group_id': group_id,
+                    'display_name': display_names.get(user_id),
+                    'joined_at': datetime.utcnow(),
+                    'is_admin': False,
+                    'is_blocked': False
+                }
+                for user_id in chunk
+            ])
+            db.session.commit()
+
+        for chunk in chunked(removed):
+            db.session.execute(
+                delete(Member).where(Member.group_id == group_id, Member.user_id.in_(chunk))
+            )
+            db.session.commit()
+
+        renamed = 0
+        if full:
+            renamed = self._update_display_names(group_id, display_names, skip=set(added))
+
+        if added or removed:
+            db.session.add(AuditLog(
+                group_id=group_id,
+                action='roster_synced',
+                details={'added': len(added), 'removed': len(removed), 'total': len(remote_ids)}
+            ))
+            db.session.commit()
+
+        logger.info(f"Roster sync {group_id}: +{len(added)} -{len(removed)} ({len(remote_ids)} members)")
+
+        return {
+            'group_id': group_id,
+            'total': len(remote_ids),
+            'added': len(added),
+            'removed': len(removed),
+            'renamed': renamed
+        }
+
+    def sync_all(self, full=False):
+        """
+        同步所有群組
+
+        Returns:
+            list: 各群組的同步結果
+        """
+        group_ids = [row.group_id for row in db.session.query(Group.group_id)]
+        results = []
+        for group_id in group_ids:
+            try:
+                result = self.sync_group(group_id, full=full)
+                if result:
+                    results.append(result)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error syncing roster of group {group_id}: {e}")
+        return results
+
+    def _fetch_display_names(self, group_id, user_ids):
+        display_names = {}
+        for user_id in user_ids:
+            try:
+                profile = self.line_bot_api.get_group_member_profile(group_id, user_id)
+                if profile is not None:
+                    display_names[user_id] = profile.display_name
+            except LineBotApiError as e:
+                logger.warning(f"Could not fetch profile of {user_id} in {group_id}: {e}")
+        return display_names
+
+    def _update_display_names(self, group_id, display_names, skip):
+        current = {
+            row.user_id: row.display_name for row in
+            db.session.query(Member.user_id, Member.display_name).filter(Member.group_id == group_id)
+        }
+        changes = [
+            {'b_user_id': user_id, 'b_display_name': name}
+            for user_id, name in display_names.items()
+            if user_id not in skip and user_id in current and current[user_id] != name
+        ]
+
+        statement = update(Member).where(
+            Member.group_id == group_id,
+            Member.user_id == bindparam('b_user_id')
+        ).values(display_name=bindparam('b_display_name'))
+
+        for chunk in chunked(changes):
+            db.session.connection().execute(statement, chunk)
+            db.session.commit()
+        return len(changes)
+
+
+def start_group_sync(app, line_bot_api, group_id, full=False):
+    """
+    在背景執行緒同步單一群組；首次同步需逐一取得成員資料，
+    大群組可能需要數分鐘，不應佔用處理請求的執行緒（gunicorn 逾時會中止 worker）
+
+    Args:
+        app (Flask): Flask app，用於建立 app context
+        line_bot_api (LineBotApi): LINE Bot API 實例
+        group_id (str): 群組ID
+        full (bool): 是否重新取得所有成員的顯示名稱
+
+    Returns:
+        tuple: (同步狀態, 是否為新啟動的同步)；同一群組已在同步中時回傳進行中的狀態
+    """
+    with _sync_jobs_lock:
+        job = _sync_jobs.get(group_id)
+        if job is not None and job['status'] == 'running':
+            return dict(job), False
+        job = _sync_jobs[group_id] = {
+            'group_id': group_id,
+            'full': full,
+            'status': 'running',
+            'started_at': datetime.utcnow().isoformat(),
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        snapshot = dict(job)
+
+    def run():
+        with app.app_context():
+            try:
+                result = RosterSyncService(line_bot_api).sync_group(group_id, full=full)
+                status, error = ('done', None) if result is not None else ('failed', 'Could not fetch member IDs from LINE')
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error syncing members for group {group_id}: {e}")
+                result, status, error = None, 'failed', str(e)
+            finally:
+                db.session.remove()
+        with _sync_jobs_lock:
+            job.update(status=status, result=result, error=error, finished_at=datetime.utcnow().isoformat())
+
+    thread = threading.Thread(target=run, name=f'roster-sync-{group_id}', daemon=True)
+    thread.start()
+    return snapshot, True
+
+
+def get_group_sync(group_id):
+    """
+    取得單一群組最近一次背景同步的狀態
+
+    Returns:
+        dict: 同步狀態；此程序未同步過該群組時回傳 None
+    """
+    with _sync_jobs_lock:
+        job = _sync_jobs.get(group_id)
+        return dict(job) if job is not None else None
+
+
+def start_periodic_roster_sync(app, line_bot_api, interval_seconds):
+    """
+    啟動背景執行緒，定期以增量模式同步所有群組
+
+    Args:
+        app (Flask): Flask app，用於建立 app context
+        line_bot_api (LineBotApi): LINE Bot API 實例
+        interval_seconds (int): 同步間隔（秒）
+
+    Returns:
+        threading.Event: 設定後即停止同步
+    """
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    RosterSyncService(line_bot_api).sync_all()
+                except Exception as e:
+                    logger.error(f"Periodic roster sync failed: {e}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='roster-sync', daemon=True)
+    thread.start()
+    return stop_event
@@ -0,0 +1,38 @@
+# src/utils/banlist_parser.py
+import csv
+import json
+import re
+
+USER_ID_PATTERN = re.compile(r'^U[0-9a-f]{32}$')
+
+def iter_banlist_rows(lines, fmt="csv"):
+    """
+    逐行解析共享封鎖名單，不會一次載入整個檔案
+    CSV 格式：user_id[,reason]（可有標題列）
+    NDJSON 格式：每行一個 {"user_id": ..., "reason": ...}
+    :param lines: 可逐行讀取的文字串流
+    :param fmt: csv 或 ndjson
+    :return: 逐筆產生 (user_id, reason)；無法解析或ID格式錯誤的行產生 None
+    """
+    if fmt == "ndjson":
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                user_id = str(item.get("user_id", "")).strip()
+                reason = item.get("reason")
+            except (ValueError, AttributeError):
+                yield None
+                continue
+            yield (user_id, reason) if USER_ID_PATTERN.match(user_id) else None
+    else:
+        for row in csv.reader(lines):
+            if not row or not row[0].strip():
+                continue
+            user_id = row[0].strip()
+            if user_id.lower() == "user_id":
+                continue
+            reason = row[1].strip() if len(row) > 1 and row[1].strip() else None
+            yield (user_id, reason) if USER_ID_PATTERN.match(user_id) else None
@@ -0,0 +1,29 @@
+# src/utils/bulk.py
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.group import db
+
+CHUNK_SIZE = 500
+
+def insert_ignore(target):
+    """
+    依資料庫方言建立 INSERT ... ON CONFLICT DO NOTHING 語句
+    :param target: SQLAlchemy 模型或資料表
+    :return: 可搭配多筆參數執行的 insert 語句
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql_insert(target).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite_insert(target).on_conflict_do_nothing()
+    return insert(target)
+
+def chunked(items, size=CHUNK_SIZE):
+    """
+    將列表切成固定大小的區塊
+    :param items: 列表
+    :param size: 區塊大小
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,100 @@
+# src/utils/database.py
+import logging
+import os
+from sqlalchemy import event
+from sqlalchemy.schema import CreateIndex
+from src.models.group import db
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'src', 'database', 'app.db')}"
+
+# SQLite 調校：WAL 讓讀取不會被寫入阻擋，synchronous=NORMAL 在 WAL 下仍可確保一致性
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+def normalize_database_url(database_url):
+    """
+    正規化資料庫連線字串
+    :param database_url: 資料庫連線字串，None 時使用環境變數 DATABASE_URL 或內建 SQLite 檔案
+    :return: SQLAlchemy 可用的連線字串
+    """
+    database_url = database_url or os.environ.get("DATABASE_URL") or DEFAULT_DATABASE_URL
+    # Render / Heroku 提供的 postgres:// 已不被 SQLAlchemy 接受
+    if database_url.startswith("postgres://"):
+        database_url = "postgresql://" + database_url[len("postgres://"):]
+    return database_url
+
+def engine_options(database_url):
+    """
+    依資料庫種類產生 SQLAlchemy engine 參數
+    :param database_url: 資料庫連線字串
+    :return: SQLALCHEMY_ENGINE_OPTIONS
+    """
+    if database_url.startswith("sqlite"):
+        return {
+            'connect_args': {
+                'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+                'check_same_thread': False,
+            }
+        }
+    return {
+        'pool_size': int(os.environ.get("DB_POOL_SIZE", 5)),
+        'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        'pool_timeout': int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        'pool_recycle': int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        'pool_pre_ping': True,
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """
+    每個新的 SQLite 連線都套用 SQLITE_PRAGMAS
+    :param dbapi_connection: DB-API 連線
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_database(app, database_url=None, sqlite_tuning=True, create_tables=True):
+    """
+    設定 Flask app 的資料庫連線並建立資料表
+    :param app: Flask app
+    :param database_url: 資料庫連線字串
+    :param sqlite_tuning: 是否套用 SQLite WAL 等調校
+    :param create_tables: 是否建立資料表與缺少的索引
+    """
+    database_url = normalize_database_url(database_url)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    db.init_app(app)
+
+    with app.app_context():
+        if sqlite_tuning and db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', apply_sqlite_pragmas)
+
+        if create_tables:
+            create_tables_and_indexes()
+
+def create_tables_and_indexes():
+    """
+    建立資料表與缺少的索引（需在 app context 中呼叫）
+    """
+    db.create_all()
+    # create_all 不會替既有資料表補建索引；運算式索引無法反射檢查，改用 IF NOT EXISTS
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as e:
+                logger.error(f"Could not create index {index.name}: {e}")
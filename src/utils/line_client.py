@@ -0,0 +1,19 @@
+# src/utils/line_client.py
+import os
+import threading
+from linebot import LineBotApi
+
+_line_bot_api = None
+_lock = threading.Lock()
+
+def get_line_bot_api():
+    """
+    取得共用的 LINE Bot API 實例，第一次使用時才建立
+    :return: LineBotApi 實例
+    """
+    global _line_bot_api
+    if _line_bot_api is None:
+        with _lock:
+            if _line_bot_api is None:
+                _line_bot_api = LineBotApi(os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
+    return _line_bot_api
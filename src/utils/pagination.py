@@ -0,0 +1,109 @@
+# src/utils/pagination.py
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# 前綴搜尋的上界：接在前綴之後比任何字元都大
+_PREFIX_UPPER_BOUND = '\U0010ffff'
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    """
+    解析每頁筆數並限制在 1 ~ MAX_LIMIT
+    :param value: 查詢參數
+    :return: 每頁筆數
+    """
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+def encode_cursor(sort_value, tiebreak_value):
+    """
+    將最後一筆的排序值編碼為不透明的游標字串
+    :param sort_value: 排序欄位的值
+    :param tiebreak_value: 唯一欄位的值
+    :return: URL 安全的游標字串
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = {'t': sort_value.isoformat()}
+    raw = json.dumps([sort_value, tiebreak_value], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    解碼游標字串
+    :param cursor: encode_cursor 產生的字串
+    :return: (sort_value, tiebreak_value)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        sort_value, tiebreak_value = json.loads(raw)
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value['t'])
+        return sort_value, tiebreak_value
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def prefix_filter(expression, prefix):
+    """
+    以範圍條件做前綴搜尋，可使用一般 B-tree 索引（LIKE 在 SQLite 預設不使用索引）
+    :param expression: 欄位或運算式
+    :param prefix: 前綴
+    """
+    return and_(expression >= prefix, expression < prefix + _PREFIX_UPPER_BOUND)
+
+def lower_prefix(prefix, dialect_name):
+    """
+    以與資料庫 lower() 相同的規則將搜尋前綴轉小寫
+    :param prefix: 前綴
+    :param dialect_name: 資料庫種類；SQLite 內建的 lower() 只轉換 ASCII 字母
+    :return: 轉換後的前綴
+    """
+    if dialect_name == 'sqlite':
+        return ''.join(char.lower() if char.isascii() else char for char in prefix)
+    return prefix.lower()
+
+def keyset_page(query, sort_expression, tiebreak_column, cursor=None, limit=DEFAULT_LIMIT, descending=False):
+    """
+    以 keyset（seek）方式分頁：依排序值與唯一欄位接續上一頁最後一筆，
+    不使用 OFFSET，任何一頁的成本都只與每頁筆數有關
+
+    :param query: 已套用篩選條件的查詢
+    :param sort_expression: 排序欄位或運算式
+    :param tiebreak_column: 唯一欄位，排序值相同時用來決定順序
+    :param cursor: 上一頁回傳的游標，None 表示第一頁
+    :param limit: 每頁筆數
+    :param descending: 是否遞減排序
+    :return: (資料列, 下一頁游標或 None)
+    """
+    if cursor:
+        sort_value, tiebreak_value = decode_cursor(cursor)
+        if descending:
+            query = query.filter(
+                sort_expression <= sort_value,
+                or_(sort_expression < sort_value, and_(sort_expression == sort_value, tiebreak_column < tiebreak_value))
+            )
+        else:
+            query = query.filter(
+                sort_expression >= sort_value,
+                or_(sort_expression > sort_value, and_(sort_expression == sort_value, tiebreak_column > tiebreak_value))
+            )
+
+    if descending:
+        query = query.order_by(sort_expression.desc(), tiebreak_column.desc())
+    else:
+        query = query.order_by(sort_expression.asc(), tiebreak_column.asc())
+
+    rows = query.add_columns(sort_expression, tiebreak_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return [row[0] for row in rows], next_cursor
@@ -1,21 +1,28 @@
 import os  
 from flask import Blueprint, request, abort
-from linebot import LineBotApi, WebhookHandler
+from linebot import WebhookHandler
 from linebot.exceptions import InvalidSignatureError
-from linebot.models import MessageEvent, TextMessage, TextSendMessage, MemberLeftEvent
+from linebot.models import MessageEvent, TextMessage, TextSendMessage, MemberLeftEvent, MemberJoinedEvent
 from datetime import datetime
-from linebot import LineBotApi
+from src.services.anomaly_scorer import anomaly_scorer
+from src.services.anti_takeover import AntiTakeoverService
+from src.services.flood_detector import flood_detector
+from src.services.keyword_scanner import keyword_scanner
+from src.services.command_registry import CommandRegistry, PERMISSION_ADMIN
+from src.services.raid_lockdown import raid_lockdown, PriorityWebhookParser
+from src.utils.reply_message import reply_text_message
+from src.utils.line_client import get_line_bot_api
 
 
-webhook_bp = Blueprint('webhook', __name__, url_prefix="/callback", strict_slashes=False)
+webhook_bp = Blueprint('webhook', __name__, url_prefix="/callback")
 
 
-line_bot_api = LineBotApi(os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
 handler = WebhookHandler(os.getenv("LINE_CHANNEL_SECRET"))
+# 防護模式中，同一批事件優先處理成員加入 / 離開
+handler.parser = PriorityWebhookParser(os.getenv("LINE_CHANNEL_SECRET"), raid_lockdown)
 ADMIN_USER_IDS = ["U27bdcfedc1a0d11770345793882688c6"]
 
 LOG_DIR = "./logs"
-os.makedirs(LOG_DIR, exist_ok=True)
 ADMIN_USER_IDS = ["U27bdcfedc1a0d11770345793882688c6"]  # 你是管理員
 
 @handler.add(MemberLeftEvent)
@@ -24,7 +31,7 @@ def handle_member_left(event):
     kicker_user_id = get_kicker_id(event.source.group_id)  # 這是你自訂函數，需自己記錄最後發出踢人訊息者
 
     # 發送通知
-    line_bot_api.reply_message(
+    get_line_bot_api().reply_message(
         event.reply_token,
         TextSendMessage(text=f"⚠️ 有成員從群組離開或被踢出：\n{left_user_id}\n由：\n{kicker_user_id}")
     )
@@ -32,12 +39,12 @@ def handle_member_left(event):
     # 如果踢人者不是管理員，將其移出群組
     if kicker_user_id not in ADMIN_USER_IDS:
         try:
-            line_bot_api.kickout(event.source.group_id, kicker_user_id)
+            get_line_bot_api().kickout(event.source.group_id, kicker_user_id)
             print(f"已將未授權踢人者 {kicker_user_id} 移出群組")
         except Exception as e:
             print(f"踢出失敗：{e}")
 
-@webhook_bp.route("/", methods=["POST"])
+@webhook_bp.route("/", methods=["POST"], strict_slashes=False)
 def callback():
     signature = request.headers.get("X-Line-Signature")
     body = request.get_data(as_text=True)
@@ -47,6 +54,25 @@ def callback():
         abort(400)
     return "OK"
 
+command_registry = CommandRegistry(superuser_ids=ADMIN_USER_IDS)
+
+@command_registry.command("/myid")
+def command_myid(ctx):
+    return f"你的ID是：{ctx.user_id}"
+
+@command_registry.command("/warn", permission=PERMISSION_ADMIN)
+def command_warn(ctx):
+    append_group_log(ctx.group_id, "warn", f"⚠️ 管理員警告：{datetime.now().isoformat()} - 由 {ctx.user_id} 發出")
+    return "⚠️ 已記錄警告。"
+
+@command_registry.command("/banlist")
+def command_banlist(ctx):
+    path = f"{LOG_DIR}/{ctx.group_id}_banlist.txt"
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return "(尚無封鎖名單)"
+
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
     try:
@@ -57,42 +83,115 @@ def handle_message(event):
         if group_id is None:
             return
 
-        if text == "/myid":
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"你的ID是：{user_id}"))
-        elif text == "/warn" and user_id in ADMIN_USER_IDS:
-            log_path = f"{LOG_DIR}/{group_id}_warn.log"
-            with open(log_path, "a", encoding="utf-8") as log:
-                log.write(f"⚠️ 管理員警告：{datetime.now().isoformat()} - 由 {user_id} 發出\n")
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="⚠️ 已記錄警告。"))
-        elif text == "/banlist":
-            path = f"{LOG_DIR}/{group_id}_banlist.txt"
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            else:
-                content = "(尚無封鎖名單)"
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=content))
-        elif text.startswith("/"):
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"你說的是：{text}"))
+        is_command = text.startswith("/")
+        anomaly_scorer.observe(group_id, 'command' if is_command else 'message')
+        locked = raid_lockdown.is_active(group_id)
+
+        flood_result = flood_detector.inspect(group_id, user_id, text)
+        if flood_result['is_flood']:
+            AntiTakeoverService(get_line_bot_api()).record_flood(group_id, user_id, text, flood_result)
+            if locked:
+                raid_lockdown.add_alert(group_id, 'flood', [user_id])
+            return
+
+        keyword_scanner.ensure_loaded()
+        keyword_matches = keyword_scanner.scan(group_id, text)
+        if keyword_matches:
+            AntiTakeoverService(get_line_bot_api()).record_keyword_match(group_id, user_id, text, keyword_matches)
+            if locked:
+                raid_lockdown.add_alert(group_id, 'keyword', [user_id])
+            return
+
+        if locked:
+            # 防護模式中不回覆指令
+            if is_command:
+                raid_lockdown.add_alert(group_id, 'command', [user_id])
+            return
+
+        reply_text = command_registry.dispatch(group_id, user_id, text, event)
+        if reply_text:
+            reply_text_message(get_line_bot_api(), event.reply_token, reply_text)
     except Exception as e:
         print(f"處理訊息時出錯：{e}")
 
+@handler.add(MemberJoinedEvent)
+def handle_member_joined(event):
+    try:
+        group_id = getattr(event.source, 'group_id', None)
+        if group_id is None:
+            return
+
+        joined_ids = [member.user_id for member in event.joined.members]
+        service = AntiTakeoverService(get_line_bot_api())
+        locked = raid_lockdown.is_active(group_id)
+
+        # 防護動作優先：先處理黑名單成員，再做速率統計與通知
+        blocked_ids = service.find_blocked_users(group_id, joined_ids)
+        for user_id in blocked_ids:
+            service.kick_member(group_id, user_id)
+
+        is_mass_join = service.check_mass_join(group_id, len(joined_ids))
+        if locked:
+            # 防護模式中只累計，由背景執行緒定期送出合併通知
+            raid_lockdown.add_alert(group_id, 'join', joined_ids)
+            if blocked_ids:
+                raid_lockdown.add_alert(group_id, 'kick', blocked_ids)
+            return
+
+        if is_mass_join:
+            append_group_log(group_id, "warn", f"🚨 異常大量加入：{datetime.now().isoformat()} - {', '.join(joined_ids)}")
+
+            push_to_admins(f"🚨 群組 {group_id} 加入速率異常，疑似翻群，已進入防護模式：\n" + "\n".join(joined_ids))
+
+        if blocked_ids:
+            push_to_admins(f"⛔ 群組 {group_id} 有黑名單成員加入：\n" + "\n".join(blocked_ids))
+    except Exception as e:
+        print(f"處理成員加入事件時出錯：{e}")
+
 @handler.add(MemberLeftEvent)
 def handle_member_left(event):
     try:
-        left_user_id = event.left.members[0].user_id if hasattr(event.left, 'members') and event.left.members else "未知"
+        left_ids = [member.user_id for member in event.left.members] if hasattr(event.left, 'members') and event.left.members else []
+        left_user_id = left_ids[0] if left_ids else "未知"
         group_id = getattr(event.source, 'group_id', None)
         if group_id:
-            log_path = f"{LOG_DIR}/{group_id}_warn.log"
-            with open(log_path, "a", encoding="utf-8") as log:
-                log.write(f"🚨 成員離開偵測：{datetime.now().isoformat()} - {left_user_id}\n")
-
-            for admin_id in ADMIN_USER_IDS:
-                try:
-                    line_bot_api.push_message(admin_id, TextSendMessage(
-                        text=f"⚠️ 有成員從群組 {group_id} 離開或被踢出：\n{left_user_id}"
-                    ))
-                except Exception as e:
-                    print(f"通知失敗: {e}")
+            left_count = len(left_ids) or 1
+            result = anomaly_scorer.observe(group_id, 'leave', left_count)
+
+            locked = raid_lockdown.is_active(group_id)
+            if result['is_anomalous']:
+                raid_lockdown.enter(group_id, 'mass_leave')
+            if locked:
+                raid_lockdown.add_alert(group_id, 'leave', left_ids, count=left_count)
+                return
+
+            append_group_log(group_id, "warn", f"🚨 成員離開偵測：{datetime.now().isoformat()} - {left_user_id}")
+
+            text = f"⚠️ 有成員從群組 {group_id} 離開或被踢出：\n{left_user_id}"
+            if result['is_anomalous']:
+                text = f"🚨 群組 {group_id} 離開速率異常，疑似大量踢人，已進入防護模式！\n" + text
+            push_to_admins(text)
     except Exception as e:
         print(f"處理成員離開事件時出錯：{e}")
+
+def push_to_admins(text):
+    # 回傳送達的管理員人數
+    sent = 0
+    for admin_id in ADMIN_USER_IDS:
+        try:
+            get_line_bot_api().push_message(admin_id, TextSendMessage(text=text))
+            sent += 1
+        except Exception as e:
+            print(f"通知失敗: {e}")
+    return sent
+
+_log_dir_ready = False
+
+def append_group_log(group_id, kind, line):
+    # 第一次寫入時才建立 log 目錄，避免匯入模組時產生檔案系統副作用
+    global _log_dir_ready
+    if not _log_dir_ready:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        _log_dir_ready = True
+    with open(f"{LOG_DIR}/{group_id}_{kind}.log", "a", encoding="utf-8") as log:
+        log.write(line + "\n")
@@ -0,0 +1,15 @@
+import pytest
+from flask import Flask
+
+from src.services import anti_takeover
+from src.utils.database import configure_database
+
+
+@pytest.fixture
+def app():
+    app = Flask('tests')
+    configure_database(app, 'sqlite://')
+    # 每個測試使用新的資料庫，清除程序內已知群組的快取
+    anti_takeover._known_group_ids.clear()
+    with app.app_context():
+        yield app
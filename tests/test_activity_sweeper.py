@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.group import db, Group, AuditLog, GroupSweepState
+from src.services import activity_sweeper
+from src.services.activity_sweeper import ActivitySweeper
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def sweeper(app, sent, monkeypatch):
+    # 沒有 LINE API 時群組管理員通知失敗，改用 notifier
+    monkeypatch.setattr(activity_sweeper, 'get_line_bot_api', lambda: None)
+    db.session.add_all([Group('G1'), Group('G2'), Group('G3')])
+    db.session.commit()
+
+    def notifier(text):
+        sent.append(text)
+        return True
+
+    sweeper = ActivitySweeper(app, max_workers=2, min_suspicious_events=3, notifier=notifier)
+    yield sweeper
+    sweeper.shutdown()
+
+
+def add_log(group_id, timestamp, suspicious=False, log_id=None):
+    log = AuditLog(group_id=group_id, action='member_joined', is_suspicious=suspicious)
+    log.timestamp = timestamp
+    if log_id is not None:
+        log.log_id = log_id
+    db.session.add(log)
+    db.session.commit()
+
+
+def test_slow_raid_adds_up_inside_the_window(sweeper, sent):
+    findings = []
+    for round_index in range(3):
+        now = NOW + timedelta(minutes=round_index)
+        add_log('G1', now - timedelta(seconds=1), suspicious=True)
+        findings.append(sweeper.sweep(now=now)['findings'])
+
+    assert findings[:2] == [[], []]
+    assert findings[2][0]['suspicious_events'] == 3
+    assert findings[2][0]['notified']
+    assert len(sent) == 1 and sent[0].startswith('[防翻群警報] G1')
+
+
+def test_quiet_groups_only_advance(sweeper, sent):
+    for _ in range(5):
+        add_log('G2', NOW - timedelta(seconds=60))
+
+    result = sweeper.sweep(now=NOW)
+
+    assert result['active_groups'] == 1
+    assert result['analyzed_groups'] == 0
+    assert db.session.get(GroupSweepState, 'G2').last_log_id == 5
+    assert sweeper.sweep(now=NOW + timedelta(seconds=1))['active_groups'] == 0
+    assert sent == []
+
+
+def test_late_commit_with_smaller_id_is_still_read(sweeper):
+    add_log('G1', NOW - timedelta(seconds=5), log_id=1)
+    add_log('G2', NOW - timedelta(seconds=5), log_id=3)
+    assert sweeper.sweep(now=NOW)['active_groups'] == 2
+
+    # ID 2 在 ID 3 之後才 commit；游標仍停在 commit_lag 之前，下一輪會讀到
+    add_log('G3', NOW - timedelta(seconds=4), log_id=2)
+    result = sweeper.sweep(now=NOW + timedelta(seconds=1))
+
+    assert result['analyzed_groups'] == 0
+    assert db.session.get(GroupSweepState, 'G3').last_log_id == 2
+
+
+def test_cooldown_starts_only_after_an_alert_is_sent(sweeper, sent):
+    delivered = [False]
+
+    def notifier(text):
+        if delivered[0]:
+            sent.append(text)
+        return delivered[0]
+
+    sweeper.notifier = notifier
+
+    for index in range(3):
+        add_log('G1', NOW - timedelta(seconds=10 + index), suspicious=True)
+    assert not sweeper.sweep(now=NOW)['findings'][0]['notified']
+    assert db.session.get(GroupSweepState, 'G1').last_alert_at is None
+
+    delivered[0] = True
+    add_log('G1', NOW, suspicious=True)
+    assert sweeper.sweep(now=NOW + timedelta(seconds=60))['findings'][0]['notified']
+
+    add_log('G1', NOW + timedelta(seconds=60), suspicious=True)
+    finding = sweeper.sweep(now=NOW + timedelta(seconds=120))['findings'][0]
+    assert not finding['notified']
+    assert len(sent) == 1
+
+
+def test_first_sweep_skips_events_before_the_lookback(sweeper, sent):
+    for index in range(5):
+        add_log('G1', NOW - timedelta(hours=1, seconds=index), suspicious=True)
+
+    result = sweeper.sweep(now=NOW)
+
+    assert result['new_events'] == 0
+    assert sent == []
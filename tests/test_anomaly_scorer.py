@@ -0,0 +1,70 @@
+from src.services.anomaly_scorer import AnomalyScorer
+
+
+def feed(scorer, group_id, signal, per_minute, minutes, start):
+    """以固定速率送入事件，回傳 (被判定異常的比例, 結束時間)"""
+    step = 60.0 / per_minute
+    now = start
+    flagged = total = 0
+    while now < start + minutes * 60.0:
+        flagged += scorer.observe(group_id, signal, now=now)['is_anomalous']
+        total += 1
+        now += step
+    return flagged / total, now
+
+
+def test_cold_group_uses_fixed_floor():
+    scorer = AnomalyScorer()
+    assert not scorer.observe('G1', 'join', count=5, now=0.0)['is_anomalous']
+    assert scorer.observe('G1', 'join', count=1, now=1.0)['is_anomalous']
+
+
+def test_burst_after_warmup_is_anomalous():
+    scorer = AnomalyScorer()
+    _, now = feed(scorer, 'G1', 'join', per_minute=0.2, minutes=60, start=0.0)
+    result = scorer.observe('G1', 'join', count=10, now=now + 30.0)
+    assert result['warmed_up']
+    assert result['is_anomalous']
+
+
+def test_configured_floor_applies_after_warmup():
+    scorer = AnomalyScorer()
+    scorer.configure('G1', join_floor=20)
+    scorer.observe('G1', 'message', now=0.0)
+
+    result = scorer.observe('G1', 'join', count=4, now=700.0)
+
+    assert result['warmed_up']
+    assert not result['is_anomalous']
+    assert scorer.observe('G1', 'join', count=20, now=701.0)['is_anomalous']
+
+
+def test_floor_loader_runs_whatever_the_first_signal_is():
+    scorer = AnomalyScorer(floor_loader=lambda group_id: {'join': 50})
+    scorer.observe('G1', 'message', now=0.0)
+    assert not scorer.observe('G1', 'join', count=10, now=1.0)['is_anomalous']
+
+
+def test_sustained_step_up_becomes_the_new_baseline():
+    scorer = AnomalyScorer()
+    flagged, now = feed(scorer, 'G1', 'message', per_minute=30, minutes=120, start=0.0)
+    assert flagged == 0
+
+    flagged, now = feed(scorer, 'G1', 'message', per_minute=60, minutes=15, start=now)
+    assert flagged > 0.5
+
+    # 新的活動量持續一小時後成為基準，之後不再被判定為異常
+    _, now = feed(scorer, 'G1', 'message', per_minute=60, minutes=45, start=now)
+    flagged, now = feed(scorer, 'G1', 'message', per_minute=60, minutes=60, start=now)
+    assert flagged == 0
+
+
+def test_short_burst_barely_moves_baseline():
+    scorer = AnomalyScorer()
+    _, now = feed(scorer, 'G1', 'join', per_minute=0.5, minutes=120, start=0.0)
+    before = scorer.snapshot('G1', now=now)['signals']['join']['baseline_per_min']
+
+    assert scorer.observe('G1', 'join', count=40, now=now)['is_anomalous']
+
+    after = scorer.snapshot('G1', now=now + 1.0)['signals']['join']['baseline_per_min']
+    assert after - before < 0.5
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from src.models.group import db, Group, AuditLog, AuditLogRollup
+from src.services.audit_retention import AuditRetentionService, count_activity
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def add_logs(group_id, action, timestamp, count, suspicious=False):
+    for _ in range(count):
+        log = AuditLog(group_id=group_id, action=action, is_suspicious=suspicious)
+        log.timestamp = timestamp
+        db.session.add(log)
+    db.session.commit()
+
+
+def seed():
+    db.session.add_all([Group('G1'), Group('G2')])
+    db.session.commit()
+    old = NOW - timedelta(days=40)
+    add_logs('G1', 'member_joined', old.replace(minute=5), 3)
+    add_logs('G1', 'member_joined', old.replace(minute=50), 2, suspicious=True)
+    add_logs('G1', 'message_flood', old.replace(hour=13), 1, suspicious=True)
+    add_logs('G2', 'member_joined', old.replace(minute=20), 4)
+    add_logs('G1', 'member_joined', NOW - timedelta(days=1), 6)
+    return old
+
+
+def test_old_logs_become_hourly_rollups(app):
+    old = seed()
+
+    result = AuditRetentionService(retention_days=30, batch_size=3).run(now=NOW)
+
+    assert result['rolled_up'] == 10
+    assert result['batches'] == 4
+    assert AuditLog.query.count() == 6
+    buckets = {
+        (rollup.group_id, rollup.action, rollup.hour): (rollup.event_count, rollup.suspicious_count)
+        for rollup in AuditLogRollup.query.all()
+    }
+    assert buckets == {
+        ('G1', 'member_joined', old.replace(minute=0)): (5, 2),
+        ('G1', 'message_flood', old.replace(hour=13, minute=0)): (1, 1),
+        ('G2', 'member_joined', old.replace(minute=0)): (4, 0),
+    }
+
+
+def test_counts_are_the_same_before_and_after_rollup(app):
+    old = seed()
+    since = old.replace(minute=0)
+    before = [
+        count_activity(since),
+        count_activity(since, group_id='G1'),
+        count_activity(since, group_id='G1', suspicious_only=True),
+    ]
+
+    AuditRetentionService(retention_days=30).run(now=NOW)
+
+    assert before == [16, 12, 3]
+    assert [
+        count_activity(since),
+        count_activity(since, group_id='G1'),
+        count_activity(since, group_id='G1', suspicious_only=True),
+    ] == before
+
+
+def test_later_runs_merge_into_existing_buckets(app):
+    old = seed()
+    service = AuditRetentionService(retention_days=30)
+    service.run(now=NOW)
+
+    add_logs('G1', 'member_joined', old.replace(minute=30), 2, suspicious=True)
+    service.run(now=NOW)
+
+    rollup = AuditLogRollup.query.filter_by(group_id='G1', action='member_joined').one()
+    assert (rollup.event_count, rollup.suspicious_count) == (7, 4)
+
+
+def test_max_batches_leaves_the_rest_for_the_next_run(app):
+    seed()
+    service = AuditRetentionService(retention_days=30, batch_size=4)
+
+    assert service.run(now=NOW, max_batches=1)['rolled_up'] == 4
+    assert AuditLog.query.count() == 12
+    assert service.run(now=NOW)['rolled_up'] == 6
+    assert AuditLog.query.count() == 6
+
+
+def test_expired_rollups_are_deleted(app):
+    seed()
+    AuditRetentionService(retention_days=30).run(now=NOW)
+
+    result = AuditRetentionService(retention_days=30, rollup_retention_days=30).run(now=NOW)
+
+    assert result['expired_rollups'] == 3
+    assert AuditLogRollup.query.count() == 0
@@ -0,0 +1,56 @@
+import pytest
+
+from src.models.group import db, Group, Blacklist, AuditLog, GlobalAuditLog
+from src.routes.admin import admin_bp
+
+VALID_IDS = [f"U{index:032x}" for index in range(3)]
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_batch_rejects_malformed_ids_like_the_import(client):
+    response = client.post('/api/blacklist/block', json={
+        'user_ids': VALID_IDS + ['not-a-user', 'U123', 42, ''],
+        'reason': 'spam'
+    })
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'inserted': 3, 'skipped': 0, 'invalid': 4}
+    assert sorted(entry.user_id for entry in Blacklist.query.all()) == VALID_IDS
+
+
+def test_global_batch_writes_an_audit_record(client):
+    client.post('/api/blacklist/block', json={'user_ids': VALID_IDS})
+    client.post('/api/blacklist/unblock', json={'user_ids': VALID_IDS[:1] + ['bad']})
+
+    logs = [log.to_dict() for log in GlobalAuditLog.query.order_by(GlobalAuditLog.log_id)]
+    assert [log['action'] for log in logs] == ['users_blocked', 'users_unblocked']
+    assert logs[1]['details'] == {'removed': 1, 'skipped': 0, 'invalid': 1}
+    assert AuditLog.query.count() == 0
+
+
+def test_unknown_group_is_not_created(client):
+    for path in ['/api/groups/Cmissing/block/batch', '/api/groups/Cmissing/unblock/batch']:
+        response = client.post(path, json={'user_ids': VALID_IDS})
+        assert response.status_code == 404
+    response = client.post('/api/groups/Cmissing/blacklist/import', data=VALID_IDS[0], content_type='text/csv')
+    assert response.status_code == 404
+
+    assert db.session.get(Group, 'Cmissing') is None
+    assert Blacklist.query.count() == 0
+
+
+def test_group_batch_logs_to_the_group(client):
+    db.session.add(Group('C1'))
+    db.session.commit()
+
+    response = client.post('/api/groups/C1/block/batch', json={'user_ids': VALID_IDS})
+
+    assert response.get_json()['inserted'] == 3
+    log = AuditLog.query.filter_by(group_id='C1').one()
+    assert log.action == 'users_blocked'
+    assert GlobalAuditLog.query.count() == 0
@@ -0,0 +1,74 @@
+import pytest
+
+from src.models.group import db, Group
+from src.services.command_registry import CommandRegistry, TokenBucketLimiter, PERMISSION_ADMIN
+
+
+@pytest.fixture
+def registry(app):
+    db.session.add(Group('G1', admin_ids=['Uadmin']))
+    db.session.commit()
+
+    registry = CommandRegistry(superuser_ids=['Uroot'])
+
+    @registry.command('/myid')
+    def myid(ctx):
+        return ctx.user_id
+
+    @registry.command('/warn', permission=PERMISSION_ADMIN, min_args=1, max_args=1, usage='用法：/warn <使用者ID>')
+    def warn(ctx):
+        return f"warned {ctx.args[0]}"
+
+    return registry
+
+
+def test_token_bucket_refills_over_time():
+    limiter = TokenBucketLimiter(capacity=2, refill_per_second=1.0)
+    assert limiter.allow('k', now=0.0)
+    assert limiter.allow('k', now=0.0)
+    assert not limiter.allow('k', now=0.0)
+    assert limiter.allow('k', now=1.0)
+
+
+def test_dispatch_runs_registered_commands(registry):
+    assert registry.dispatch('G1', 'U1', '/MyID') == 'U1'
+    assert registry.dispatch('G1', 'U1', '/unknown') is None
+    assert registry.dispatch('G1', 'U1', 'hello') is None
+
+
+def test_admin_commands_check_permission_and_arguments(registry):
+    assert registry.dispatch('G1', 'U1', '/warn U2') is None
+    assert registry.dispatch('G1', 'Uadmin', '/warn U2') == 'warned U2'
+    assert registry.dispatch('G1', 'Uroot', '/warn U2') == 'warned U2'
+    assert registry.dispatch('G1', 'Uadmin', '/warn') == '用法：/warn <使用者ID>'
+
+
+def test_user_rate_limit(registry):
+    replies = [registry.dispatch('G1', 'U1', '/myid') for _ in range(5)]
+    assert replies[:3] == ['U1'] * 3
+    assert replies[3:] == [None, None]
+
+
+def test_raid_on_group_bucket_does_not_silence_admins(registry):
+    for index in range(50):
+        registry.dispatch('G1', f"Uraid{index}", '/myid')
+        registry.dispatch('G1', f"Uraid{index}", '/warn U2')
+
+    assert registry.dispatch('G1', 'Uother', '/myid') is None
+    assert registry.dispatch('G1', 'Uadmin', '/warn U2') == 'warned U2'
+    assert registry.dispatch('G1', 'Uadmin', '/myid') == 'Uadmin'
+
+
+def test_denied_admin_commands_do_not_use_the_group_bucket(registry):
+    for index in range(50):
+        registry.dispatch('G1', f"Uraid{index}", '/warn U2')
+
+    assert registry.dispatch('G1', 'Uother', '/myid') == 'Uother'
+
+
+def test_admin_list_is_cached(registry):
+    assert registry.is_admin('G1', 'Uadmin')
+    Group.query.filter_by(group_id='G1').first().set_admin_ids(['Unew'])
+    db.session.commit()
+    assert registry.is_admin('G1', 'Uadmin')
+    assert not registry.is_admin('G1', 'Unew')
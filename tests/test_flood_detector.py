@@ -0,0 +1,94 @@
+import random
+
+from src.services.flood_detector import FloodDetector
+
+CLAUSES = [
+    '今天的會議改到下午三點', '記得把報告寄給主管', '晚餐想吃拉麵還是火鍋', '週末要不要去爬山',
+    '我剛到捷運站了', '外面雨下得好大', '這部電影真的很好看', '有人知道停車場在哪嗎',
+    '孩子今天發燒請假在家', '明天的便當我來訂', '新的手機殼終於到貨了', '冷氣好像壞掉了要找人修',
+    '這次考試比想像中難', '車子剛好沒油了', '下班順路幫我買牛奶', '生日蛋糕已經訂好了',
+    '社區明天停水一整天', '貓咪又把杯子打破了', '機票價格最近漲很多', '健身房今天人好少',
+    '公司電梯在維修中', '新開的早餐店很好吃', '颱風好像要轉向了', '我把鑰匙忘在辦公室',
+    '超市今天有特價活動', '這週的作業還沒寫完', '阿嬤說過年要回老家', '咖啡喝太多睡不著',
+    '網路突然斷線好久', '樓下在施工好吵', '弟弟考上大學了', '房租下個月要調漲',
+    '腳踏車輪胎又破了', '中午一起去吃自助餐', '洗衣機洗到一半停了', '圖書館的書要還了',
+    '高鐵票已經買好了', '電費帳單比上個月多', '朋友的婚禮在十月', '牙醫預約改到週四',
+    '新同事人很好相處', '狗狗今天特別黏人', '夜市的雞排漲價了', '晚上記得看球賽',
+    '媽媽做的滷肉最好吃', '冰箱裡的水果快壞了', '明天早上要早起', '博物館有新的展覽',
+    '老闆說下週要加班', '公車誤點了二十分鐘', '電腦更新後變很慢', '陽台的花開了',
+    '體檢報告出來了都正常', '雨傘借給同學了', '這家火鍋要排隊很久', '週五晚上唱歌嗎',
+    '車票錢我先轉給你', '書店在打七折', '感冒還沒好要多喝水', '行李箱輪子壞掉了',
+]
+
+
+def chat_lines(seed, count=200):
+    # 由不同子句組成、互不相同但用字相近的聊天訊息
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < count:
+        line = '，'.join(rng.sample(CLAUSES, 3))
+        if line not in lines:
+            lines.append(line)
+    return lines
+
+
+def test_distinct_chat_lines_are_rarely_duplicates():
+    flagged = total = 0
+    for seed in range(5):
+        detector = FloodDetector()
+        for index, line in enumerate(chat_lines(seed)):
+            result = detector.inspect('G1', f"U{index}", line, now=1000.0 + index * 0.3)
+            flagged += 'duplicate' in result['reasons']
+            total += 1
+    assert flagged <= total * 0.02
+
+
+def test_similar_sentences_from_a_few_users_are_not_duplicates():
+    detector = FloodDetector()
+    lines = [
+        '明天晚上七點在車站前面集合',
+        '明天晚上七點半在車站前面等你們',
+        '我明天晚上可能會晚一點到車站',
+        '明天晚上在車站集合的話要帶傘嗎',
+        '明天晚上七點車站見，不要遲到',
+    ]
+    for index, line in enumerate(lines):
+        result = detector.inspect('G1', f"U{index}", line, now=1000.0 + index)
+        assert 'duplicate' not in result['reasons'], line
+
+
+def test_spam_variants_from_many_users_are_duplicates():
+    detector = FloodDetector()
+    results = [
+        detector.inspect('G1', f"S{index}", f"加入我的投資群組每天穩賺{index}萬！！保證獲利請私訊我", now=1000.0 + index)
+        for index in range(6)
+    ]
+    assert 'duplicate' not in results[0]['reasons']
+    assert all('duplicate' in result['reasons'] for result in results[3:])
+
+
+def test_same_text_on_different_days_is_not_a_repeat():
+    detector = FloodDetector()
+    for day in range(3):
+        result = detector.inspect('G1', 'U1', '早安', now=1000.0 + day * 86400.0)
+        assert result['repeats'] == 1
+        assert not result['is_flood']
+
+
+def test_same_text_in_quick_succession_is_a_repeat():
+    detector = FloodDetector()
+    results = [detector.inspect('G1', 'U1', '早安', now=1000.0 + index) for index in range(3)]
+    assert results[-1]['reasons'] == ['repeat']
+
+
+def test_short_replies_keep_their_digits():
+    detector = FloodDetector()
+    results = [detector.inspect('G1', 'U1', f"+{index}", now=1000.0 + index * 5) for index in range(1, 4)]
+    assert [result['repeats'] for result in results] == [1, 1, 1]
+    assert not any(result['is_flood'] for result in results)
+
+
+def test_repeated_commands_are_left_to_the_command_limiter():
+    detector = FloodDetector()
+    results = [detector.inspect('G1', 'U1', '/myid', now=1000.0 + index) for index in range(3)]
+    assert not any(result['is_flood'] for result in results)
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.group import db, KeywordRule
+from src.services.keyword_scanner import KeywordScanner
+
+
+def make_scanner(*rules):
+    scanner = KeywordScanner()
+    scanner._loaded = True
+    scanner.add_rules([
+        SimpleNamespace(id=index, group_id=None, pattern=pattern, kind=kind)
+        for index, (pattern, kind) in enumerate(rules, start=1)
+    ])
+    return scanner
+
+
+@pytest.mark.parametrize('text', [
+    '請點line-gift.example領取',
+    '快去line-gift.example。',
+    'visit line-gift.example, now',
+    'https://line-gift.example/claim',
+    '網址：LINE-GIFT.EXAMPLE',
+    'evil.line-gift.example',
+    'line-gift.example.',
+])
+def test_domain_rule_matches_next_to_text_and_punctuation(text):
+    scanner = make_scanner(('line-gift.example', 'domain'))
+    assert [hit['pattern'] for hit in scanner.scan('G1', text)] == ['line-gift.example']
+
+
+@pytest.mark.parametrize('text', [
+    'notline-gift.example',
+    'my-line-gift.example',
+    'line-gift.examples',
+    'line-gift.example-2',
+    'line-gift.example.com',
+])
+def test_domain_rule_skips_longer_hostnames(text):
+    scanner = make_scanner(('line-gift.example', 'domain'))
+    assert scanner.scan('G1', text) == []
+
+
+def test_deleted_rule_id_is_not_reused(app):
+    first = KeywordRule('一')
+    second = KeywordRule('二')
+    db.session.add_all([first, second])
+    db.session.commit()
+    max_id = second.id
+
+    db.session.delete(second)
+    db.session.commit()
+    third = KeywordRule('三')
+    db.session.add(third)
+    db.session.commit()
+
+    assert third.id > max_id
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from src.models.group import db, Group, coalesced_datetime, lowered_text
+from src.routes.admin import admin_bp
+from src.utils.pagination import keyset_page, prefix_filter
+
+
+def page_all(sort_expression, tiebreak_column, limit, descending=False, max_pages=20):
+    ids = []
+    cursor = None
+    for _ in range(max_pages):
+        items, cursor = keyset_page(Group.query, sort_expression, tiebreak_column,
+                                    cursor=cursor, limit=limit, descending=descending)
+        ids.extend(item.group_id for item in items)
+        if cursor is None:
+            return ids
+    raise AssertionError(f"paging did not finish, got {ids}")
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_created_at_paging_keeps_null_timestamps(app, descending):
+    for index in range(8):
+        group = Group(f"G{index}")
+        group.created_at = datetime(2024, 1, index + 1, 12, 0, 0)
+        db.session.add(group)
+    db.session.commit()
+    Group.query.filter(Group.group_id < 'G5').update({'created_at': None})
+    db.session.commit()
+    assert Group.query.filter(Group.created_at.is_(None)).count() == 5
+
+    ids = page_all(coalesced_datetime(Group.created_at), Group.group_id, limit=2, descending=descending)
+
+    expected = [f"G{index}" for index in range(8)]
+    assert ids == (expected[::-1] if descending else expected)
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_name_prefix_search_ignores_ascii_case(client):
+    db.session.add_all([
+        Group('C1', group_name='LINE 官方群'),
+        Group('C2', group_name='Line fans'),
+        Group('C3', group_name='lineage'),
+        Group('C4', group_name='Other'),
+        Group('C5', group_name='群組 Line'),
+        Group('C6'),
+    ])
+    db.session.commit()
+
+    def search(q):
+        groups = client.get('/api/groups', query_string={'q': q}).get_json()['groups']
+        return sorted(group['group_id'] for group in groups)
+
+    assert search('line') == ['C1', 'C2', 'C3']
+    assert search('LINE 官') == ['C1']
+    assert search('群組 line') == ['C5']
+    # 群組ID前綴仍需完全相符
+    assert search('C') == ['C1', 'C2', 'C3', 'C4', 'C5', 'C6']
+    assert search('c') == []
+
+
+def test_name_prefix_search_uses_the_lowered_index(app):
+    query = Group.query.filter(prefix_filter(lowered_text(Group.group_name), 'line'))
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = ' '.join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")))
+    assert 'ix_groups_name_lower' in plan
@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import hmac
+import json
+
+from linebot.models import MemberJoinedEvent, MessageEvent
+
+from src.models.group import db, AuditLog
+from src.services.raid_lockdown import RaidLockdown, PriorityWebhookParser
+
+SECRET = 'test-secret'
+
+
+def test_retrigger_extends_lockdown():
+    lockdown = RaidLockdown(cooldown_seconds=60.0)
+    assert lockdown.enter('G1', 'join_rate', now=0.0)
+    assert not lockdown.enter('G1', 'join_rate', now=50.0)
+
+    assert lockdown.is_active('G1', now=100.0)
+    assert lockdown.status('G1', now=100.0)['triggers'] == 2
+    assert not lockdown.is_active('G1', now=110.0)
+    assert not lockdown.is_active('G2', now=0.0)
+
+
+def test_exit_releases_on_next_drain():
+    lockdown = RaidLockdown(cooldown_seconds=60.0)
+    lockdown.enter('G1', 'join_rate', now=0.0)
+
+    assert lockdown.exit('G1')
+    assert not lockdown.exit('G2')
+    assert lockdown.status('G1', now=1.0) is None
+    assert lockdown.drain_alerts(now=1.0) == [('G1', '🛡️ 群組 G1 防護模式已解除')]
+    assert lockdown.active_groups(now=1.0) == []
+
+
+def test_alerts_are_merged_per_group():
+    lockdown = RaidLockdown(cooldown_seconds=60.0, max_alert_samples=2)
+    lockdown.enter('G1', 'join_rate', now=0.0)
+    lockdown.add_alert('G1', 'join', ['U1', 'U2'])
+    lockdown.add_alert('G1', 'join', ['U3'])
+    lockdown.add_alert('G1', 'flood', count=5)
+
+    messages = lockdown.drain_alerts(now=1.0)
+
+    assert messages == [('G1', '🛡️ 群組 G1 防護模式中\n加入：3\n  U1\n  U2…\n洗版：5')]
+    assert lockdown.drain_alerts(now=2.0) == []
+
+
+def test_buffered_audit_is_written_in_one_flush(app):
+    lockdown = RaidLockdown(max_buffered_audit=3)
+    assert not lockdown.buffer_audit('G1', 'U1', 'member_joined')
+    assert not lockdown.buffer_audit('G1', 'U2', 'member_joined', details={'n': 1})
+    assert lockdown.buffer_audit('G1', 'U3', 'member_joined', is_suspicious=True)
+
+    sent = []
+    result = lockdown.flush(sent.append, now=0.0)
+
+    assert result == {'audit_written': 3, 'alerts_sent': 0}
+    assert AuditLog.query.filter_by(group_id='G1').count() == 3
+    assert lockdown.flush_audit() == 0
+
+
+def test_failed_notifier_does_not_stop_flush(app):
+    lockdown = RaidLockdown(cooldown_seconds=60.0)
+    lockdown.enter('G1', 'join_rate', now=0.0)
+    lockdown.add_alert('G1', 'kick', ['U1'])
+
+    def notifier(text):
+        raise RuntimeError('push failed')
+
+    assert lockdown.flush(notifier, now=1.0)['alerts_sent'] == 1
+
+
+def make_body(group_id):
+    source = {'type': 'group', 'groupId': group_id, 'userId': 'U1'}
+    common = {'mode': 'active', 'webhookEventId': 'E', 'deliveryContext': {'isRedelivery': False}, 'source': source}
+    events = [
+        dict(common, type='message', timestamp=1, replyToken='r1', message={'type': 'text', 'id': '1', 'text': 'hi'}),
+        dict(common, type='memberJoined', timestamp=2, replyToken='r2',
+             joined={'members': [{'type': 'user', 'userId': 'U2'}]}),
+    ]
+    return json.dumps({'destination': 'D', 'events': events})
+
+
+def parse(lockdown, body):
+    signature = base64.b64encode(hmac.new(SECRET.encode(), body.encode(), hashlib.sha256).digest()).decode()
+    return PriorityWebhookParser(SECRET, lockdown).parse(body, signature)
+
+
+def test_parser_moves_member_events_first_only_in_lockdown():
+    lockdown = RaidLockdown(cooldown_seconds=1e12)
+    lockdown.enter('G1', 'join_rate')
+
+    locked = parse(lockdown, make_body('G1'))
+    normal = parse(lockdown, make_body('G2'))
+
+    assert [type(event) for event in locked] == [MemberJoinedEvent, MessageEvent]
+    assert [type(event) for event in normal] == [MessageEvent, MemberJoinedEvent]
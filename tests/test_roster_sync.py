@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from linebot.exceptions import LineBotApiError
+from linebot.models.error import Error
+
+from src.models.group import db, Group, Member, AuditLog
+from src.services.roster_sync import RosterSyncService, start_group_sync, get_group_sync
+
+
+class StubLineBotApi:
+    def __init__(self, member_ids, names=None, page_size=2, fail=False, delay=0.0):
+        self.member_ids = list(member_ids)
+        self.names = names or {}
+        self.page_size = page_size
+        self.fail = fail
+        self.delay = delay
+        self.profile_calls = []
+
+    def get_group_member_ids(self, group_id, start=None):
+        if self.fail:
+            raise LineBotApiError(403, {}, error=Error(message='Access to this API is not available'))
+        offset = int(start or 0)
+        page = self.member_ids[offset:offset + self.page_size]
+        following = offset + self.page_size
+        return SimpleNamespace(member_ids=page, next=str(following) if following < len(self.member_ids) else None)
+
+    def get_group_member_profile(self, group_id, user_id):
+        time.sleep(self.delay)
+        self.profile_calls.append(user_id)
+        return SimpleNamespace(display_name=self.names.get(user_id, user_id.lower()))
+
+
+def member_names(group_id):
+    return {member.user_id: member.display_name for member in Member.query.filter_by(group_id=group_id)}
+
+
+def test_incremental_sync_adds_and_removes_members(app):
+    service = RosterSyncService(StubLineBotApi(['U1', 'U2', 'U3']))
+    result = service.sync_group('G1')
+    assert result == {'group_id': 'G1', 'total': 3, 'added': 3, 'removed': 0, 'renamed': 0}
+    assert member_names('G1') == {'U1': 'u1', 'U2': 'u2', 'U3': 'u3'}
+
+    api = StubLineBotApi(['U2', 'U3', 'U4'])
+    result = RosterSyncService(api).sync_group('G1')
+    assert (result['added'], result['removed']) == (1, 1)
+    assert api.profile_calls == ['U4']
+    assert set(member_names('G1')) == {'U2', 'U3', 'U4'}
+    assert AuditLog.query.filter_by(group_id='G1', action='roster_synced').count() == 2
+
+
+def test_full_sync_updates_display_names(app):
+    RosterSyncService(StubLineBotApi(['U1', 'U2'])).sync_group('G1')
+
+    api = StubLineBotApi(['U1', 'U2'], names={'U1': '新名字'})
+    result = RosterSyncService(api).sync_group('G1', full=True)
+
+    assert result['renamed'] == 1
+    assert sorted(api.profile_calls) == ['U1', 'U2']
+    assert member_names('G1') == {'U1': '新名字', 'U2': 'u2'}
+
+
+def test_sync_returns_none_when_member_ids_are_unavailable(app):
+    assert RosterSyncService(StubLineBotApi([], fail=True)).sync_group('G1') is None
+    assert db.session.get(Group, 'G1') is None
+
+
+def wait_for(group_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_group_sync(group_id)
+        if job['status'] != 'running':
+            return job
+        time.sleep(0.01)
+    raise AssertionError('sync did not finish')
+
+
+def test_background_sync_runs_once_per_group(app):
+    api = StubLineBotApi([f"U{index}" for index in range(10)], delay=0.02)
+
+    job, started = start_group_sync(app, api, 'G-bg')
+    again, started_again = start_group_sync(app, api, 'G-bg')
+
+    assert started and job['status'] == 'running'
+    assert not started_again and again['started_at'] == job['started_at']
+    finished = wait_for('G-bg')
+    assert finished['status'] == 'done'
+    assert finished['result']['added'] == 10
+    assert len(api.profile_calls) == 10
+
+
+def test_background_sync_reports_failures(app):
+    start_group_sync(app, StubLineBotApi([], fail=True), 'G-fail')
+    finished = wait_for('G-fail')
+    assert finished['status'] == 'failed'
+    assert finished['error'] == 'Could not fetch member IDs from LINE'
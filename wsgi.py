@@ -0,0 +1,4 @@
+# 正式環境 WSGI 進入點：gunicorn -c gunicorn.conf.py wsgi:app
+from src.app import create_app
+
+app = create_app()